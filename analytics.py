@@ -0,0 +1,114 @@
+"""
+Profit-and-loss analytics computed with grouped SQL aggregates.
+
+Each table is scanned once per report: jobs are grouped by period, payment method and
+status, expenditures by period. pandas only reshapes those small aggregated frames.
+"""
+
+from datetime import timedelta
+import pandas as pd
+from app import db, Job, JobItem, Expenditure, ArchivedJob, ArchivedJobItem, ArchivedExpenditure
+
+PERIODS = ('week', 'month')
+PAYMENT_METHODS = ('Cash', 'Transfer')
+
+def period_expression(column, period):
+    """SQL expression giving the first day ('YYYY-MM-DD') of the week/month a timestamp falls in"""
+    dialect = db.engine.dialect.name
+    # Inline literals rather than bind parameters, so PostgreSQL sees the SELECT
+    # and GROUP BY expressions as identical
+    literal = lambda value: db.literal_column(f"'{value}'")
+    if dialect == 'postgresql':
+        return db.func.to_char(db.func.date_trunc(literal(period), column), literal('YYYY-MM-DD'))
+    if dialect == 'mysql':
+        if period == 'month':
+            return db.func.date_format(column, literal('%Y-%m-01'))
+        return db.func.date_format(db.func.subdate(column, db.func.weekday(column)), literal('%Y-%m-%d'))
+    # SQLite: weeks start on Monday, like date_trunc('week') and WEEKDAY()
+    if period == 'month':
+        return db.func.strftime(literal('%Y-%m-01'), column)
+    return db.func.date(column, literal('weekday 0'), literal('-6 days'))
+
+def period_start(day, period):
+    if period == 'month':
+        return day.replace(day=1)
+    return day - timedelta(days=day.weekday())
+
+def _job_totals(job_model, item_model, start, end, period):
+    label = period_expression(job_model.date_time, period)
+    item_totals = db.session.query(
+        item_model.job_id.label('job_id'),
+        db.func.sum(item_model.total).label('amount')
+    ).join(job_model, job_model.id == item_model.job_id).filter(
+        job_model.date_time >= start,
+        job_model.date_time < end
+    ).group_by(item_model.job_id).subquery()
+
+    return db.session.query(
+        label,
+        job_model.payment_method,
+        job_model.status,
+        db.func.count(job_model.id),
+        db.func.coalesce(db.func.sum(item_totals.c.amount), 0)
+    ).outerjoin(item_totals, item_totals.c.job_id == job_model.id).filter(
+        job_model.date_time >= start,
+        job_model.date_time < end
+    ).group_by(label, job_model.payment_method, job_model.status).all()
+
+def _expenditure_totals(model, start, end, period):
+    label = period_expression(model.date_time, period)
+    return db.session.query(
+        label,
+        db.func.count(model.id),
+        db.func.coalesce(db.func.sum(model.total), 0)
+    ).filter(
+        model.date_time >= start,
+        model.date_time < end
+    ).group_by(label).all()
+
+def pnl_report(start, end, period='month', include_archived_jobs=False, include_archived_expenditures=False):
+    """P&L per period for start <= date_time < end, as a DataFrame indexed by period start"""
+    job_rows = _job_totals(Job, JobItem, start, end, period)
+    if include_archived_jobs:
+        job_rows += _job_totals(ArchivedJob, ArchivedJobItem, start, end, period)
+
+    expenditure_rows = _expenditure_totals(Expenditure, start, end, period)
+    if include_archived_expenditures:
+        expenditure_rows += _expenditure_totals(ArchivedExpenditure, start, end, period)
+
+    jobs = pd.DataFrame(job_rows, columns=['period', 'payment_method', 'status', 'jobs', 'amount'])
+    expenditures = pd.DataFrame(expenditure_rows, columns=['period', 'entries', 'amount'])
+    jobs['period'] = pd.to_datetime(jobs['period'])
+    expenditures['period'] = pd.to_datetime(expenditures['period'])
+    # MySQL/PostgreSQL return Decimal sums
+    jobs['amount'] = jobs['amount'].astype(float)
+    expenditures['amount'] = expenditures['amount'].astype(float)
+
+    # Every period in the range gets a row, even without activity
+    freq = 'MS' if period == 'month' else 'W-MON'
+    periods = pd.date_range(period_start(start.date(), period), end.date() - timedelta(days=1), freq=freq, name='period')
+
+    completed = jobs[jobs['status'] == 'Completed']
+    incomplete = jobs[jobs['status'] != 'Completed']
+
+    revenue_by_method = completed.pivot_table(
+        index='period', columns='payment_method', values='amount', aggfunc='sum'
+    ).reindex(index=periods, columns=list(PAYMENT_METHODS))
+
+    report = pd.DataFrame(index=periods)
+    report['cash_revenue'] = revenue_by_method['Cash']
+    report['transfer_revenue'] = revenue_by_method['Transfer']
+    report['revenue'] = completed.groupby('period')['amount'].sum()
+    report['jobs_completed'] = completed.groupby('period')['jobs'].sum()
+    report['incomplete_value'] = incomplete.groupby('period')['amount'].sum()
+    report['jobs_incomplete'] = incomplete.groupby('period')['jobs'].sum()
+    report['expenditures'] = expenditures.groupby('period')['amount'].sum()
+    report = report.fillna(0)
+    report['net_balance'] = report['revenue'] - report['expenditures']
+
+    count_columns = ['jobs_completed', 'jobs_incomplete']
+    report[count_columns] = report[count_columns].astype(int)
+    return report
+
+def report_totals(report):
+    return report.sum().to_dict()
@@ -29,7 +29,8 @@ try:
 except ImportError:
     MATPLOTLIB_AVAILABLE = False
 
-app = Flask(__name__)
+# INSTANCE_PATH (absolute) moves the instance folder, e.g. for loadtest.py's scratch runs
+app = Flask(__name__, instance_path=os.environ.get('INSTANCE_PATH') or None)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///business_management.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
@@ -39,6 +40,19 @@ login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+# gzip/brotli for HTML, JSON and PDF responses
+from compression import init_compression
+init_compression(app)
+from scheduler import init_scheduler
+init_scheduler(app)
+from login_throttle import init_login_throttle
+init_login_throttle(app)
+
+# Reverse proxies in front of the app (1 on Render), so request.remote_addr is the client's address
+if app.config['TRUSTED_PROXY_COUNT']:
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'])
+
 # Database Models
 class User(UserMixin, db.Model):
     __tablename__ = 'users'  # Explicit table name
@@ -58,23 +72,32 @@ class User(UserMixin, db.Model):
 
 class Job(db.Model):
     __tablename__ = 'jobs'
+    __table_args__ = {'sqlite_autoincrement': True}  # Archived ids must not come back
     id = db.Column(db.Integer, primary_key=True)
     customer_name = db.Column(db.String(100), nullable=False)
+    customer_key = db.Column(db.String(100), index=True)  # Customer.key_for(customer_name), set automatically
     status = db.Column(db.String(20), nullable=False, default='Incomplete')  # 'Completed' or 'Incomplete'
     payment_method = db.Column(db.String(20), nullable=False, default='Cash')  # 'Cash' or 'Transfer'
-    date_time = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    date_time = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Bumped on every edit
     creator = db.relationship('User', backref='jobs')
     items = db.relationship('JobItem', backref='job', lazy=True, cascade='all, delete-orphan')
     
+    @db.validates('customer_name')
+    def _set_customer_key(self, key, customer_name):
+        self.customer_key = Customer.key_for(customer_name)
+        return customer_name
+    
     @property
     def total_amount(self):
         return sum(item.total for item in self.items)
 
 class JobItem(db.Model):
     __tablename__ = 'job_items'
+    __table_args__ = {'sqlite_autoincrement': True}  # Archived ids must not come back
     id = db.Column(db.Integer, primary_key=True)
-    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=False)
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=False, index=True)
     description = db.Column(db.String(200), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
@@ -82,15 +105,83 @@ class JobItem(db.Model):
 
 class Expenditure(db.Model):
     __tablename__ = 'expenditures'
+    __table_args__ = {'sqlite_autoincrement': True}  # Archived ids must not come back
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.String(200), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     amount_used = db.Column(db.Float, nullable=False)
     total = db.Column(db.Float, nullable=False)
-    date_time = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    date_time = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Bumped on every edit
     creator = db.relationship('User', backref='expenditures')
 
+class Customer(db.Model):
+    __tablename__ = 'customers'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)  # Display name as first entered
+    name_key = db.Column(db.String(100), unique=True, nullable=False, index=True)  # Case-folded lookup key
+    job_count = db.Column(db.Integer, nullable=False, default=0)
+    lifetime_revenue = db.Column(db.Float, nullable=False, default=0)  # Completed jobs only
+    last_visit = db.Column(db.DateTime)
+    
+    @staticmethod
+    def key_for(name):
+        return ' '.join(name.split()).casefold()
+
+class ChangeLog(db.Model):
+    __tablename__ = 'change_log'
+    __table_args__ = {'sqlite_autoincrement': True}  # Never reuse sequence numbers
+    seq = db.Column(db.Integer, primary_key=True)  # Monotonic sequence number
+    entity = db.Column(db.String(20), nullable=False)  # 'job', 'job_item', 'expenditure' or 'user'
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # 'upsert' or 'delete'
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    applied_at = db.Column(db.DateTime)  # NULL while the migration is still running
+    progress = db.Column(db.Integer)  # Last id processed by an interrupted backfill
+
+# Archive (cold) tables - same columns as the live tables, filled by archive_database.py
+class ArchivedJob(db.Model):
+    __tablename__ = 'jobs_archive'
+    id = db.Column(db.Integer, primary_key=True)
+    customer_name = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    payment_method = db.Column(db.String(20), nullable=False)
+    date_time = db.Column(db.DateTime, nullable=False, index=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    creator = db.relationship('User')
+    items = db.relationship('ArchivedJobItem', backref='job', lazy=True, cascade='all, delete-orphan')
+
+    @property
+    def total_amount(self):
+        return sum(item.total for item in self.items)
+
+class ArchivedJobItem(db.Model):
+    __tablename__ = 'job_items_archive'
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('jobs_archive.id'), nullable=False, index=True)
+    description = db.Column(db.String(200), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    total = db.Column(db.Float, nullable=False)
+
+class ArchivedExpenditure(db.Model):
+    __tablename__ = 'expenditures_archive'
+    id = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(200), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    amount_used = db.Column(db.Float, nullable=False)
+    total = db.Column(db.Float, nullable=False)
+    date_time = db.Column(db.DateTime, nullable=False, index=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    creator = db.relationship('User')
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
@@ -112,6 +203,8 @@ if __name__ == '__main__':
     # In your app.py (lines 116-117)
     with app.app_context():
         db.create_all()  # Creates all tables defined in models
+        from migrations import run_migrations
+        run_migrations()  # Brings an existing database up to the current schema
         
         # Create demo users if they don't exist
         if not User.query.filter_by(username='admin').first():
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Database Archival Script - Moves old jobs and expenditures into the archive tables
+Records older than ARCHIVE_AFTER_DAYS are copied to jobs_archive, job_items_archive
+and expenditures_archive and removed from the live tables in batched transactions.
+"""
+
+import os
+import argparse
+from datetime import datetime, timedelta
+import search
+import scheduler
+from migrations import pending_migrations
+from app import app, db, Job, JobItem, Expenditure, ArchivedJob, ArchivedJobItem, ArchivedExpenditure
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+DEFAULT_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+
+def copy_rows(live_table, archive_table, where):
+    """INSERT ... SELECT the archive table's columns from the live table"""
+    columns = [column.name for column in archive_table.columns]
+    source = db.select(*[live_table.c[name] for name in columns]).where(where)
+    db.session.execute(archive_table.insert().from_select(columns, source))
+
+def archive_jobs(cutoff, batch_size):
+    """Move jobs (and their items) older than cutoff, one transaction per batch"""
+    jobs_table = Job.__table__
+    items_table = JobItem.__table__
+    moved = 0
+
+    while True:
+        ids = [row[0] for row in db.session.query(Job.id).filter(
+            Job.date_time < cutoff
+        ).order_by(Job.id).limit(batch_size).all()]
+
+        if not ids:
+            break
+
+        try:
+            copy_rows(jobs_table, ArchivedJob.__table__, jobs_table.c.id.in_(ids))
+            copy_rows(items_table, ArchivedJobItem.__table__, items_table.c.job_id.in_(ids))
+            db.session.execute(items_table.delete().where(items_table.c.job_id.in_(ids)))
+            db.session.execute(jobs_table.delete().where(jobs_table.c.id.in_(ids)))
+            search.remove_jobs(ids)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        moved += len(ids)
+        print(f"   ...{moved} jobs archived")
+
+    return moved
+
+def archive_expenditures(cutoff, batch_size):
+    """Move expenditures older than cutoff, one transaction per batch"""
+    table = Expenditure.__table__
+    moved = 0
+
+    while True:
+        ids = [row[0] for row in db.session.query(Expenditure.id).filter(
+            Expenditure.date_time < cutoff
+        ).order_by(Expenditure.id).limit(batch_size).all()]
+
+        if not ids:
+            break
+
+        try:
+            copy_rows(table, ArchivedExpenditure.__table__, table.c.id.in_(ids))
+            db.session.execute(table.delete().where(table.c.id.in_(ids)))
+            search.remove_expenditures(ids)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        moved += len(ids)
+        print(f"   ...{moved} expenditures archived")
+
+    return moved
+
+def main():
+    parser = argparse.ArgumentParser(description='Move old jobs and expenditures into the archive tables.')
+    parser.add_argument('--days', type=int, default=DEFAULT_AFTER_DAYS,
+                        help=f'archive records older than this many days (default: {DEFAULT_AFTER_DAYS})')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'rows moved per transaction (default: {DEFAULT_BATCH_SIZE})')
+    args = parser.parse_args()
+
+    cutoff = datetime.now() - timedelta(days=args.days)
+
+    print("🚀 Database Archival Tool")
+    print(f"Database URL: {os.environ.get('DATABASE_URL', 'Not set')}")
+    print(f"Archiving records older than {cutoff.strftime('%Y-%m-%d %I:%M %p')} ({args.days} days)")
+
+    with app.app_context():
+        # Creates the archive tables on first run, leaves existing tables alone
+        db.create_all()
+        # Migration 6 stops SQLite from reusing archived ids; archiving without it breaks later runs
+        if pending_migrations():
+            raise SystemExit("❌ Schema migrations are pending. Run 'python migrate_database.py' first.")
+
+        print("📦 Archiving jobs...")
+        jobs_moved = archive_jobs(cutoff, args.batch_size)
+        print(f"✅ {jobs_moved} jobs archived")
+
+        print("📦 Archiving expenditures...")
+        expenditures_moved = archive_expenditures(cutoff, args.batch_size)
+        print(f"✅ {expenditures_moved} expenditures archived")
+
+        # Cached dashboard figures count live rows only
+        scheduler.clear()
+
+    print("\n🎉 Archival completed successfully!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Customer Backfill Script
+Recomputes every customer's job count, lifetime revenue and last visit from the live and
+archived jobs, in short batches so it can run against a live app. Deploys do this once
+through migration 7; run this script whenever the totals look off.
+"""
+
+import os
+from app import app, db
+from customers import rebuild_customers
+from migrations import pending_migrations
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+if __name__ == '__main__':
+    print("🚀 Customer Backfill Tool")
+    print(f"Database URL: {os.environ.get('DATABASE_URL', 'Not set')}")
+
+    with app.app_context():
+        db.create_all()  # Creates the customers table on first run
+        # Live jobs are matched through jobs.customer_key, which migration 3 fills
+        if pending_migrations():
+            raise SystemExit("❌ Schema migrations are pending. Run 'python migrate_database.py' first.")
+
+        print("🔨 Computing customer totals from jobs...")
+        customer_count = rebuild_customers()
+        print(f"✅ {customer_count} customers backfilled")
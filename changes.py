@@ -0,0 +1,117 @@
+"""
+Change feed for incremental client sync.
+
+Write routes append to change_log in the same transaction as the change itself, so a
+committed change always has a sequence number. Clients ask for everything after the
+last sequence they saw and receive the current state of changed rows, or a deletion.
+"""
+
+import os
+from datetime import datetime, timedelta
+from app import db, User, Job, JobItem, Expenditure, ChangeLog
+
+DEFAULT_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 5000
+
+def record(entity, entity_ids, action='upsert'):
+    """Queue change_log rows for the current transaction"""
+    now = datetime.now()
+    for entity_id in entity_ids:
+        db.session.add(ChangeLog(entity=entity, entity_id=entity_id, action=action, changed_at=now))
+
+def _settle_seconds():
+    # SQLite serializes writers, so sequence numbers commit in order. On MySQL and
+    # PostgreSQL a transaction can commit after a later-numbered one; holding back the
+    # newest few seconds keeps clients from skipping over such a change.
+    default = '0' if db.engine.dialect.name == 'sqlite' else '5'
+    return int(os.environ.get('CHANGE_FEED_SETTLE_SECONDS', default))
+
+def _serialize_job(job):
+    return {
+        'customer_name': job.customer_name,
+        'status': job.status,
+        'payment_method': job.payment_method,
+        'date_time': job.date_time.isoformat(),
+        'created_by': job.created_by,
+        'version': job.version,
+    }
+
+def _serialize_job_item(item):
+    return {
+        'job_id': item.job_id,
+        'description': item.description,
+        'quantity': item.quantity,
+        'price': item.price,
+        'total': item.total,
+    }
+
+def _serialize_expenditure(expenditure):
+    return {
+        'description': expenditure.description,
+        'quantity': expenditure.quantity,
+        'amount_used': expenditure.amount_used,
+        'total': expenditure.total,
+        'date_time': expenditure.date_time.isoformat(),
+        'created_by': expenditure.created_by,
+        'version': expenditure.version,
+    }
+
+def _serialize_user(user):
+    return {
+        'username': user.username,
+        'role': user.role,
+    }
+
+ENTITIES = {
+    'job': (Job, _serialize_job),
+    'job_item': (JobItem, _serialize_job_item),
+    'expenditure': (Expenditure, _serialize_expenditure),
+    'user': (User, _serialize_user),
+}
+
+def head():
+    """Newest sequence number a client can sync from. A new client reads it, downloads a full
+    snapshot, then asks for changes since it; anything in both just arrives twice."""
+    query = db.session.query(ChangeLog.seq)
+    settle = _settle_seconds()
+    if settle:
+        query = query.filter(ChangeLog.changed_at <= datetime.now() - timedelta(seconds=settle))
+    return query.order_by(ChangeLog.seq.desc()).limit(1).scalar() or 0
+
+def changes_since(since, limit=DEFAULT_BATCH_SIZE, entities=None):
+    """One batch of changes after sequence `since`, newest state per row"""
+    query = ChangeLog.query.filter(ChangeLog.seq > since)
+    settle = _settle_seconds()
+    if settle:
+        query = query.filter(ChangeLog.changed_at <= datetime.now() - timedelta(seconds=settle))
+    rows = query.order_by(ChangeLog.seq).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_seq = rows[-1].seq if rows else since
+
+    # Several changes to one row within a batch collapse into the last one
+    latest = {}
+    for row in rows:
+        if entities is None or row.entity in entities:
+            latest.pop((row.entity, row.entity_id), None)
+            latest[(row.entity, row.entity_id)] = row
+
+    current = {}
+    for entity, (model, _) in ENTITIES.items():
+        ids = [entity_id for (kind, entity_id), row in latest.items() if kind == entity and row.action == 'upsert']
+        if ids:
+            current[entity] = {record.id: record for record in model.query.filter(model.id.in_(ids)).all()}
+
+    changes = []
+    for (entity, entity_id), row in latest.items():
+        change = {'seq': row.seq, 'entity': entity, 'id': entity_id, 'action': row.action}
+        if row.action == 'upsert':
+            record = current.get(entity, {}).get(entity_id)
+            if record is None:
+                # Deleted after this change - its delete comes later in the feed
+                continue
+            change['data'] = ENTITIES[entity][1](record)
+        changes.append(change)
+
+    return {'since': since, 'next': next_seq, 'head': head(), 'has_more': has_more, 'changes': changes}
@@ -0,0 +1,201 @@
+"""
+Response compression and precompressed export artifacts.
+
+init_compression(app) gzip-compresses (or brotli, when the brotli package is installed
+and the client accepts it) text-like responses above COMPRESS_MIN_SIZE. Streamed and
+send_file responses are compressed chunk by chunk instead of being buffered.
+
+Generated exports can be stored in the instance folder already compressed, so repeat
+downloads are served straight from disk without compressing them again.
+"""
+
+import os
+import gzip
+import zlib
+import tempfile
+from flask import current_app, request, Response
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# .xlsx files are zip archives already, so they are left out on purpose
+COMPRESSIBLE_TYPES = {
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/csv',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'application/pdf',
+    'image/svg+xml',
+}
+
+ARTIFACT_DIR = 'export_cache'
+
+def init_compression(app):
+    app.config.setdefault('COMPRESS_ENABLED', os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true')
+    app.config.setdefault('COMPRESS_MIN_SIZE', int(os.environ.get('COMPRESS_MIN_SIZE', DEFAULT_MIN_SIZE)))
+    app.config.setdefault('COMPRESS_LEVEL', int(os.environ.get('COMPRESS_LEVEL', DEFAULT_GZIP_LEVEL)))
+    app.after_request(compress_response)
+
+def choose_encoding():
+    """Best encoding the client accepts: 'br', 'gzip' or None"""
+    accepted = request.accept_encodings
+    if BROTLI_AVAILABLE and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=current_app.config['COMPRESS_LEVEL'])
+
+class _CompressedStream:
+    """Compresses an iterable of chunks lazily and closes the original when done"""
+
+    def __init__(self, iterable, encoding, level):
+        self.iterable = iterable
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress_chunk = self.compressor.process
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+            self.compress_chunk = self.compressor.compress
+        self.encoding = encoding
+
+    def __iter__(self):
+        for chunk in self.iterable:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = self.compress_chunk(chunk)
+            if data:
+                yield data
+        yield self.compressor.finish() if self.encoding == 'br' else self.compressor.flush()
+
+    def close(self):
+        if hasattr(self.iterable, 'close'):
+            self.iterable.close()
+
+def compress_response(response):
+    config = current_app.config
+    if not config['COMPRESS_ENABLED']:
+        return response
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    if 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    content_length = response.content_length
+    if content_length is not None and content_length < config['COMPRESS_MIN_SIZE']:
+        return response
+
+    if response.is_streamed or response.direct_passthrough:
+        response.response = _CompressedStream(response.response, encoding, config['COMPRESS_LEVEL'])
+        response.direct_passthrough = False
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+        response.set_data(_compress(data, encoding))
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak=weak)
+    return response
+
+# Precompressed artifacts
+def artifact_dir():
+    path = os.path.join(current_app.instance_path, ARTIFACT_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def write_atomic(path, data):
+    # Written to a temp file first so other workers never serve a partial artifact
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as tmp:
+        tmp.write(data)
+    os.replace(tmp_path, path)
+
+def _artifact_files(name):
+    return [os.path.join(artifact_dir(), name + suffix) for suffix in ('', '.gz', '.br')]
+
+def store_artifact(name, data, mimetype):
+    """Save an artifact, compressed ahead of time when its type benefits from it"""
+    base = os.path.join(artifact_dir(), name)
+    if mimetype in COMPRESSIBLE_TYPES:
+        write_atomic(base + '.gz', gzip.compress(data, compresslevel=9))
+        if BROTLI_AVAILABLE:
+            write_atomic(base + '.br', brotli.compress(data, quality=11))
+    else:
+        write_atomic(base, data)
+
+def has_artifact(name):
+    return any(os.path.exists(path) for path in _artifact_files(name))
+
+def artifact_names():
+    names = set()
+    for filename in os.listdir(artifact_dir()):
+        if filename.startswith('tmp'):
+            continue
+        for suffix in ('.gz', '.br'):
+            if filename.endswith(suffix):
+                filename = filename[:-len(suffix)]
+        names.add(filename)
+    return names
+
+def remove_artifact(name):
+    for path in _artifact_files(name):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def clear_artifacts():
+    """Remove every stored artifact, e.g. after a database reset"""
+    for name in artifact_names():
+        remove_artifact(name)
+
+def send_artifact(name, mimetype, download_name):
+    """Serve a stored artifact in the client's preferred encoding without recompressing it.
+    Returns None when the artifact is missing (e.g. removed by another worker)."""
+    plain_path, gzip_path, brotli_path = _artifact_files(name)
+    encoding = choose_encoding()
+    headers = {'Content-Disposition': f'attachment; filename="{download_name}"', 'Vary': 'Accept-Encoding'}
+
+    try:
+        if os.path.exists(plain_path):
+            data = _read(plain_path)
+        elif encoding == 'br' and os.path.exists(brotli_path):
+            data = _read(brotli_path)
+            headers['Content-Encoding'] = 'br'
+        elif request.accept_encodings['gzip']:
+            data = _read(gzip_path)
+            headers['Content-Encoding'] = 'gzip'
+        else:
+            data = gzip.decompress(_read(gzip_path))
+    except FileNotFoundError:
+        return None
+
+    return Response(data, mimetype=mimetype, headers=headers)
+
+def _read(path):
+    with open(path, 'rb') as artifact:
+        return artifact.read()
@@ -0,0 +1,231 @@
+"""
+Customer aggregates kept up to date by the job write routes.
+
+Each job contributes to its customer's job count, lifetime revenue (completed jobs
+only) and last visit. The routes call job_added/job_removed with a snapshot of the
+job before commit, so the counters change in the same transaction as the job.
+"""
+
+from sqlalchemy.exc import IntegrityError
+from app import db, Job, JobItem, ArchivedJob, ArchivedJobItem, Customer
+
+AUTOCOMPLETE_LIMIT = 10
+
+def snapshot(job, total=None):
+    """The parts of a job that feed the customer aggregates"""
+    return {
+        'customer_name': job.customer_name,
+        'status': job.status,
+        'total': job.total_amount if total is None else total,
+        'date_time': job.date_time,
+    }
+
+def _revenue(contribution):
+    return contribution['total'] if contribution['status'] == 'Completed' else 0
+
+def _get_or_create(name):
+    key = Customer.key_for(name)
+    customer = Customer.query.filter_by(name_key=key).first()
+    if customer:
+        return customer
+    try:
+        # Savepoint so a concurrent insert of the same key doesn't abort the job write
+        with db.session.begin_nested():
+            customer = Customer(name=' '.join(name.split()), name_key=key, job_count=0, lifetime_revenue=0)
+            db.session.add(customer)
+    except IntegrityError:
+        customer = Customer.query.filter_by(name_key=key).first()
+    return customer
+
+def job_added(contribution):
+    customer = _get_or_create(contribution['customer_name'])
+    # SQL-side increments so concurrent workers never lose an update
+    Customer.query.filter_by(id=customer.id).update({
+        Customer.job_count: Customer.job_count + 1,
+        Customer.lifetime_revenue: Customer.lifetime_revenue + _revenue(contribution),
+        Customer.last_visit: db.case(
+            (Customer.last_visit.is_(None), contribution['date_time']),
+            (Customer.last_visit < contribution['date_time'], contribution['date_time']),
+            else_=Customer.last_visit
+        ),
+    }, synchronize_session=False)
+
+def job_removed(contribution, job_id):
+    key = Customer.key_for(contribution['customer_name'])
+    customer = Customer.query.filter_by(name_key=key).first()
+    if customer is None:
+        return
+
+    Customer.query.filter_by(id=customer.id).update({
+        Customer.job_count: Customer.job_count - 1,
+        Customer.lifetime_revenue: Customer.lifetime_revenue - _revenue(contribution),
+    }, synchronize_session=False)
+
+    # Only the customer's most recent job moves last_visit back
+    if customer.last_visit is not None and contribution['date_time'] >= customer.last_visit:
+        Customer.query.filter_by(id=customer.id).update({
+            Customer.last_visit: _last_visit(key, exclude_job_ids=[job_id])
+        }, synchronize_session=False)
+
+def _grouped_by_key(rows):
+    """Merge per-customer_name rows into per-customer-key totals"""
+    totals = {}
+    for name, job_count, revenue, last_visit in rows:
+        entry = totals.setdefault(Customer.key_for(name), [0, 0.0, None])
+        entry[0] += job_count
+        entry[1] += float(revenue or 0)
+        if last_visit is not None and (entry[2] is None or last_visit > entry[2]):
+            entry[2] = last_visit
+    return totals
+
+def _job_totals_by_customer(job_ids, *criteria, completed_only=True):
+    """customer_name, job count, revenue and latest date for the given jobs, items summed in SQL"""
+    item_totals = db.session.query(
+        JobItem.job_id.label('job_id'),
+        db.func.sum(JobItem.total).label('total')
+    ).filter(JobItem.job_id.in_(job_ids)).group_by(JobItem.job_id).subquery()
+    total = db.func.coalesce(item_totals.c.total, 0)
+    if completed_only:
+        total = db.case((Job.status == 'Completed', total), else_=0)
+    return db.session.query(
+        Job.customer_name,
+        db.func.count(Job.id),
+        db.func.sum(total),
+        db.func.max(Job.date_time)
+    ).outerjoin(item_totals, item_totals.c.job_id == Job.id).filter(
+        Job.id.in_(job_ids), *criteria
+    ).group_by(Job.customer_name).all()
+
+def jobs_status_changed(job_ids, new_status):
+    """Bulk status change: move the jobs' totals in or out of lifetime revenue (call before the UPDATE)"""
+    if new_status == 'Completed':
+        rows = _job_totals_by_customer(job_ids, Job.status != 'Completed', completed_only=False)
+        sign = 1
+    else:
+        rows = _job_totals_by_customer(job_ids, Job.status == 'Completed', completed_only=False)
+        sign = -1
+    for key, (_, revenue, _) in _grouped_by_key(rows).items():
+        Customer.query.filter_by(name_key=key).update({
+            Customer.lifetime_revenue: Customer.lifetime_revenue + sign * revenue
+        }, synchronize_session=False)
+
+def jobs_removed(job_ids):
+    """Bulk job_removed for the given jobs (call before the DELETE)"""
+    for key, (job_count, revenue, latest) in _grouped_by_key(_job_totals_by_customer(job_ids)).items():
+        customer = Customer.query.filter_by(name_key=key).first()
+        if customer is None:
+            continue
+        Customer.query.filter_by(id=customer.id).update({
+            Customer.job_count: Customer.job_count - job_count,
+            Customer.lifetime_revenue: Customer.lifetime_revenue - revenue,
+        }, synchronize_session=False)
+        if customer.last_visit is not None and latest is not None and latest >= customer.last_visit:
+            Customer.query.filter_by(id=customer.id).update({
+                Customer.last_visit: _last_visit(key, exclude_job_ids=job_ids)
+            }, synchronize_session=False)
+
+def _last_visit(key, exclude_job_ids=()):
+    # Live jobs carry their key in an indexed column
+    query = db.session.query(db.func.max(Job.date_time)).filter(Job.customer_key == key)
+    if exclude_job_ids:
+        query = query.filter(Job.id.notin_(exclude_job_ids))
+    latest = query.scalar()
+
+    archived = db.session.query(ArchivedJob.customer_name, db.func.max(ArchivedJob.date_time)).filter(
+        db.func.lower(db.func.trim(ArchivedJob.customer_name)) == key
+    ).group_by(ArchivedJob.customer_name).all()
+    for name, visited in archived:
+        if visited is not None and Customer.key_for(name) == key and (latest is None or visited > latest):
+            latest = visited
+    return latest
+
+def _like_prefix(prefix):
+    return prefix.replace('!', '!!').replace('%', '!%').replace('_', '!_') + '%'
+
+def autocomplete(prefix, limit=AUTOCOMPLETE_LIMIT):
+    """Customers with jobs whose key starts with prefix. A plain LIKE 'prefix%' so it can use
+    the pattern index from migration 7 (text_pattern_ops / COLLATE NOCASE) on every backend."""
+    key = Customer.key_for(prefix)
+    if not key:
+        return []
+    return Customer.query.filter(
+        Customer.name_key.like(_like_prefix(key), escape='!'),
+        Customer.job_count > 0
+    ).order_by(Customer.name_key).limit(limit).all()
+
+def archived_totals():
+    """Per-key totals of the archived jobs, which only archive_database.py changes"""
+    item_totals = db.session.query(
+        ArchivedJob.id.label('job_id'),
+        db.func.coalesce(db.func.sum(ArchivedJobItem.total), 0).label('total')
+    ).outerjoin(ArchivedJobItem, ArchivedJobItem.job_id == ArchivedJob.id).group_by(ArchivedJob.id).subquery()
+    rows = db.session.query(
+        ArchivedJob.customer_name,
+        db.func.count(ArchivedJob.id),
+        db.func.sum(db.case((ArchivedJob.status == 'Completed', item_totals.c.total), else_=0)),
+        db.func.max(ArchivedJob.date_time)
+    ).join(item_totals, item_totals.c.job_id == ArchivedJob.id).group_by(ArchivedJob.customer_name).all()
+    return _grouped_by_key(rows)
+
+def ensure_customer_rows(archived, batch_size):
+    """Create a zero-count row for every customer key that has jobs but no row yet"""
+    names = dict(db.session.query(Job.customer_key, db.func.min(Job.customer_name)).filter(
+        Job.customer_key.isnot(None)
+    ).group_by(Job.customer_key).all())
+    for name, in db.session.query(ArchivedJob.customer_name).distinct():
+        names.setdefault(Customer.key_for(name), name)
+    existing = {key for key, in db.session.query(Customer.name_key)}
+    created = 0
+    for key, name in sorted(names.items()):
+        if key and key not in existing:
+            _get_or_create(name)
+            created += 1
+            if created % batch_size == 0:
+                db.session.commit()
+    db.session.commit()
+    return created
+
+def refresh_customers(first_id, last_id, archived):
+    """Recompute the aggregates of customers first_id..last_id; the caller commits.
+
+    The no-op UPDATE comes first so it locks these rows (the whole database on SQLite):
+    a job written meanwhile either committed before it, and is counted below, or waits
+    for our commit and then applies its own increment on top."""
+    Customer.query.filter(Customer.id.between(first_id, last_id)).update(
+        {Customer.job_count: Customer.job_count}, synchronize_session=False)
+    batch = Customer.query.filter(Customer.id.between(first_id, last_id)).all()
+    if not batch:
+        return
+    keys = [customer.name_key for customer in batch]
+
+    item_totals = db.session.query(
+        JobItem.job_id.label('job_id'),
+        db.func.sum(JobItem.total).label('total')
+    ).join(Job, Job.id == JobItem.job_id).filter(Job.customer_key.in_(keys)).group_by(JobItem.job_id).subquery()
+    live = dict((key, (job_count, float(revenue or 0), last_visit)) for key, job_count, revenue, last_visit in
+                db.session.query(
+                    Job.customer_key,
+                    db.func.count(Job.id),
+                    db.func.sum(db.case((Job.status == 'Completed', db.func.coalesce(item_totals.c.total, 0)), else_=0)),
+                    db.func.max(Job.date_time)
+                ).outerjoin(item_totals, item_totals.c.job_id == Job.id).filter(
+                    Job.customer_key.in_(keys)
+                ).group_by(Job.customer_key).all())
+
+    for customer in batch:
+        job_count, revenue, last_visit = live.get(customer.name_key, (0, 0.0, None))
+        old_count, old_revenue, old_visit = archived.get(customer.name_key, (0, 0.0, None))
+        customer.job_count = job_count + old_count
+        customer.lifetime_revenue = revenue + old_revenue
+        customer.last_visit = max((visit for visit in (last_visit, old_visit) if visit is not None), default=None)
+
+def rebuild_customers(batch_size=500):
+    """Recompute every customer's aggregates from the live and archived jobs, one short
+    transaction per batch of customers, so it is safe to run while the app takes orders"""
+    archived = archived_totals()
+    ensure_customer_rows(archived, batch_size)
+    max_id = db.session.query(db.func.max(Customer.id)).scalar() or 0
+    for first_id in range(1, max_id + 1, batch_size):
+        refresh_customers(first_id, first_id + batch_size - 1, archived)
+        db.session.commit()
+    return Customer.query.filter(Customer.job_count > 0).count()
@@ -0,0 +1,17 @@
+"""
+Gunicorn settings, picked up automatically by `gunicorn app:app` (see Procfile).
+Bind address and worker count still come from $PORT and $WEB_CONCURRENCY.
+"""
+
+def post_worker_init(worker):
+    # Runs in each new worker before it accepts connections, so the first
+    # requests after a deploy don't pay for cold connections, templates and imports
+    import scheduler
+    import warmup
+    app = worker.app.wsgi()
+    try:
+        warmup.warm_up(app)
+    except Exception:
+        # Leave the worker unready; /readyz retries the warm-up
+        worker.log.exception('Worker warm-up failed')
+    scheduler.start_scheduler(app)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Load Test Script
+Starts the app under gunicorn against a scratch database, logs in a number of simulated
+clerks and replays a mix of front-desk traffic (adding jobs, browsing the jobs list,
+opening jobs, loading the dashboard, exporting). Prints throughput and p50/p95/p99
+latency and error rate per route, so worker classes and database backends can be compared.
+
+Examples:
+    python loadtest.py --users 50 --duration 60
+    python loadtest.py --worker-class gthread --threads 4 --mix add_job=40,jobs=30,export=30
+    python loadtest.py --database-url postgresql://... --seed-jobs 5000
+    python loadtest.py --url http://127.0.0.1:5000 --login admin:admin123   # existing server
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.cookiejar
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+DEFAULT_MIX = 'add_job=30,jobs=25,get_job=25,dashboard=15,export=5'
+PASSWORD = 'loadtest123'
+CUSTOMERS = ['Ade', 'Bola', 'Chidi', 'Dayo', 'Emeka', 'Funke', 'Gbenga', 'Halima', 'Ife', 'Jide']
+SERVICES = [('Oil change', 8000), ('Brake pads', 15000), ('Wheel alignment', 6000),
+            ('Battery', 45000), ('Car wash', 2500), ('Tyre', 30000), ('Diagnostics', 10000)]
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Time each request on its own instead of also timing the page it redirects to
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class Client:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+        self.location = None
+
+    def request(self, path, data=None):
+        """Returns the HTTP status; a redirect's target is kept in self.location"""
+        body = urllib.parse.urlencode(data, doseq=True).encode() if data is not None else None
+        self.location = None
+        try:
+            with self.opener.open(self.base_url + path, body, timeout=120) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            self.location = e.headers.get('Location')
+            return e.code
+
+    def write_failed(self):
+        """After a form POST: did it fail? Write routes catch their own errors and redirect
+        with an error flash, so the status alone can't tell. Follows the redirect (outside the
+        timed request) and looks for the flash, or for a bounce to the login page."""
+        if not self.location:
+            return True
+        url = urllib.parse.urljoin(self.base_url + '/', self.location)
+        if urllib.parse.urlsplit(url).path == '/login':
+            return True
+        with self.opener.open(url, timeout=120) as response:
+            return b'class="alert alert-danger' in response.read()
+
+    def login(self, username, password):
+        status = self.request('/login', {'username': username, 'password': password})
+        # A successful login redirects to the dashboard; a failed one re-renders the form
+        return status == 302
+
+# Traffic
+def add_job(client, state):
+    items = random.sample(SERVICES, random.randint(1, 4))
+    return client.request('/add_job', {
+        'customer_name': random.choice(CUSTOMERS),
+        'status': random.choice(['Completed', 'Completed', 'Incomplete']),
+        'payment_method': random.choice(['Cash', 'Transfer']),
+        'description[]': [description for description, _ in items],
+        'quantity[]': [str(random.randint(1, 3)) for _ in items],
+        'price[]': [str(price) for _, price in items],
+    })
+
+def jobs(client, state):
+    return client.request('/jobs?filter=' + random.choice(['today', 'week', 'month']))
+
+def get_job(client, state):
+    return client.request(f'/get_job/{random.randint(1, state["max_job_id"])}')
+
+def dashboard(client, state):
+    return client.request('/dashboard')
+
+def export(client, state):
+    kind = random.choice(['jobs', 'expenditures'])
+    filter_type = random.choice(['month', 'all'])
+    format_type = random.choice(['excel', 'pdf'])
+    return client.request(f'/export_{kind}?filter={filter_type}&format={format_type}')
+
+# Form POSTs whose outcome is only visible in the flash on the page they redirect to
+WRITE_ACTIONS = {'add_job'}
+
+ACTIONS = {
+    'add_job': add_job,
+    'jobs': jobs,
+    'get_job': get_job,
+    'dashboard': dashboard,
+    'export': export,
+}
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ACTIONS:
+            raise SystemExit(f"❌ Unknown action '{name}' in --mix (choose from {', '.join(ACTIONS)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+# Scratch database
+def seed_database(users, seed_jobs):
+    """Create the schema, the load-test users and a year of jobs/expenditures; returns the highest job ID"""
+    from app import app, db, User, Job, JobItem, Expenditure
+    from customers import rebuild_customers
+
+    rnd = random.Random(42)
+    with app.app_context():
+        db.create_all()
+        for number in range(1, users + 1):
+            user = User(username=f'clerk{number}', role='admin' if number == 1 else 'normal')
+            user.set_password(PASSWORD)
+            db.session.add(user)
+        db.session.flush()
+
+        now = datetime.now()
+        for _ in range(seed_jobs):
+            when = now - timedelta(days=rnd.randint(0, 365), minutes=rnd.randint(0, 600))
+            job = Job(customer_name=rnd.choice(CUSTOMERS), status=rnd.choice(['Completed', 'Incomplete']),
+                      payment_method=rnd.choice(['Cash', 'Transfer']), date_time=when, created_by=1)
+            db.session.add(job)
+            db.session.flush()
+            for description, price in rnd.sample(SERVICES, rnd.randint(1, 4)):
+                quantity = rnd.randint(1, 3)
+                db.session.add(JobItem(job_id=job.id, description=description, quantity=quantity,
+                                       price=price, total=quantity * price))
+            amount = rnd.choice(SERVICES)[1] / 2
+            db.session.add(Expenditure(description='Spare parts', quantity=1, amount_used=amount,
+                                       total=amount, date_time=when, created_by=1))
+        db.session.commit()
+        rebuild_customers()
+        return db.session.query(db.func.max(Job.id)).scalar() or 1
+
+# Server
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_gunicorn(args, env, port):
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+               '--workers', str(args.workers), '--worker-class', args.worker_class,
+               '--threads', str(args.threads), '--log-level', 'warning']
+    server = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+
+    # /readyz only passes once a worker has warmed up
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise SystemExit('❌ gunicorn exited during startup')
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/readyz', timeout=2) as response:
+                if response.status == 200:
+                    return server
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.25)
+    server.terminate()
+    raise SystemExit('❌ gunicorn did not become ready within 60 seconds')
+
+# Load
+def run_user(base_url, username, password, weights, state, stop_at, results, lock):
+    client = Client(base_url)
+    started = time.perf_counter()
+    ok = client.login(username, password)
+    samples = [('login', time.perf_counter() - started, ok)]
+    if ok:
+        names, chances = list(weights), list(weights.values())
+        while time.time() < stop_at:
+            name = random.choices(names, chances)[0]
+            started = time.perf_counter()
+            try:
+                status = ACTIONS[name](client, state)
+                elapsed = time.perf_counter() - started
+                ok = status < 400
+                if ok and name in WRITE_ACTIONS:
+                    ok = status == 302 and not client.write_failed()
+            except (urllib.error.URLError, OSError):
+                elapsed = time.perf_counter() - started
+                ok = False
+            samples.append((name, elapsed, ok))
+            if state['think_time']:
+                time.sleep(random.uniform(0, 2 * state['think_time']))
+    with lock:
+        results.extend(samples)
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(results, elapsed):
+    routes = {}
+    for name, seconds, ok in results:
+        routes.setdefault(name, []).append((seconds, ok))
+
+    summary = {'elapsed_seconds': round(elapsed, 2), 'requests': len(results),
+               'throughput_rps': round(len(results) / elapsed, 2), 'routes': {}}
+    for name, samples in sorted(routes.items()):
+        latencies = sorted(seconds * 1000 for seconds, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        summary['routes'][name] = {
+            'requests': len(samples),
+            'rps': round(len(samples) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 0.50), 1),
+            'p95_ms': round(percentile(latencies, 0.95), 1),
+            'p99_ms': round(percentile(latencies, 0.99), 1),
+            'error_rate': round(errors / len(samples), 4),
+        }
+    return summary
+
+def print_summary(summary):
+    print(f"\n📊 {summary['requests']} requests in {summary['elapsed_seconds']}s "
+          f"({summary['throughput_rps']} req/s)")
+    print(f"{'route':<12}{'requests':>10}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for name, row in summary['routes'].items():
+        print(f"{name:<12}{row['requests']:>10}{row['rps']:>9}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+              f"{row['p99_ms']:>10}{row['error_rate']:>9.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay front-desk traffic against the app and report latency.')
+    parser.add_argument('--users', type=int, default=10, help='concurrent simulated users (default: 10)')
+    parser.add_argument('--duration', type=int, default=30, help='seconds to generate load (default: 30)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'action weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--think-time', type=float, default=0,
+                        help='average pause between a user\'s requests in seconds (default: 0)')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers (default: 2)')
+    parser.add_argument('--worker-class', default='sync', help='gunicorn worker class (default: sync)')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker (default: 1)')
+    parser.add_argument('--database-url', help='database to load (default: a scratch SQLite file). '
+                                               'It must be empty - tables and users are created in it')
+    parser.add_argument('--seed-jobs', type=int, default=1000, help='jobs spread over the last year (default: 1000)')
+    parser.add_argument('--url', help='test an already running server instead of starting gunicorn')
+    parser.add_argument('--login', default='admin:admin123', help='username:password used with --url')
+    parser.add_argument('--max-job-id', type=int, default=100, help='highest job ID get_job may fetch with --url')
+    parser.add_argument('--json', help='also write the summary to this file')
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    state = {'think_time': args.think_time, 'max_job_id': args.max_job_id}
+
+    print("🚀 Load Test")
+    print(f"Users: {args.users}, duration: {args.duration}s, mix: {args.mix}")
+
+    scratch = tempfile.TemporaryDirectory(prefix='loadtest-')
+    server = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+            username, _, password = args.login.partition(':')
+            credentials = [(username, password)] * args.users
+        else:
+            # Keep the scratch database, export cache and precomputed figures out of the real instance folder
+            env = dict(os.environ)
+            env['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(scratch.name, 'loadtest.db')}"
+            env['INSTANCE_PATH'] = scratch.name
+            env['LOGIN_THROTTLE_ENABLED'] = 'false'  # every simulated user logs in from 127.0.0.1
+            os.environ.update(env)
+
+            print(f"🔨 Seeding {env['DATABASE_URL']} with {args.users} users and {args.seed_jobs} jobs...")
+            state['max_job_id'] = seed_database(args.users, args.seed_jobs)
+
+            port = free_port()
+            print(f"🚀 Starting gunicorn ({args.workers} x {args.worker_class}, {args.threads} threads) on port {port}...")
+            server = start_gunicorn(args, env, port)
+            base_url = f'http://127.0.0.1:{port}'
+            credentials = [(f'clerk{number}', PASSWORD) for number in range(1, args.users + 1)]
+
+        print(f"🏃 Running for {args.duration}s...")
+        results, lock = [], threading.Lock()
+        started = time.time()
+        stop_at = started + args.duration
+        threads = [
+            threading.Thread(target=run_user, args=(base_url, username, password, weights, state, stop_at, results, lock))
+            for username, password in credentials
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - started
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        scratch.cleanup()
+
+    summary = summarize(results, elapsed)
+    summary['config'] = {key: value for key, value in vars(args).items() if key not in ('login', 'json')}
+    print_summary(summary)
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(summary, output, indent=2)
+        print(f"\n✅ Summary written to {args.json}")
+
+if __name__ == '__main__':
+    main()
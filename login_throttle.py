@@ -0,0 +1,171 @@
+"""
+Sliding-window limiter for login attempts.
+
+Every login POST is counted against the username and the client IP before the user is
+looked up or a password hash is checked, so a credential-stuffing burst is turned away
+cheaply. A successful login clears its username's window.
+
+The per-IP limit always uses request.remote_addr, never a header the client could set.
+Behind a reverse proxy TRUSTED_PROXY_COUNT must be set so that this is the real client's
+address; until it is, every client shares the proxy's address and limit, and a warning
+is logged when X-Forwarded-For shows up.
+
+Attempts are kept in process memory by default. With LOGIN_THROTTLE_STORE=sqlite they
+go to a small SQLite file in the instance folder instead, shared by all workers.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from collections import Counter, deque
+from flask import current_app, request
+
+DEFAULT_WINDOW_SECONDS = 300
+DEFAULT_MAX_PER_USERNAME = 5
+DEFAULT_MAX_PER_IP = 30
+SQLITE_FILE = 'login_throttle.sqlite'
+SWEEP_EVERY = 1000  # hits between sweeps of expired attempts for idle keys
+
+_stats = Counter()
+
+class MemoryStore:
+    def __init__(self):
+        self.attempts = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+
+    def hit(self, key, limit, window, now):
+        """Record an attempt unless the key is at its limit; returns seconds to wait (0 = allowed)"""
+        with self.lock:
+            self.hits += 1
+            if self.hits % SWEEP_EVERY == 0:
+                self._sweep(now - window)
+            attempts = self.attempts.setdefault(key, deque())
+            while attempts and attempts[0] <= now - window:
+                attempts.popleft()
+            if len(attempts) >= limit:
+                return attempts[0] + window - now
+            attempts.append(now)
+            return 0
+
+    def clear(self, key):
+        with self.lock:
+            self.attempts.pop(key, None)
+
+    def tracked_keys(self):
+        return len(self.attempts)
+
+    def _sweep(self, cutoff):
+        for key in [key for key, attempts in self.attempts.items() if not attempts or attempts[-1] <= cutoff]:
+            del self.attempts[key]
+
+class SQLiteStore:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        self.hits = 0
+
+    @property
+    def connection(self):
+        # Opened lazily per process, so a connection is never shared across a fork
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS login_attempts (key TEXT NOT NULL, ts REAL NOT NULL)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS ix_login_attempts_key_ts ON login_attempts (key, ts)')
+            self._pid = os.getpid()
+        return self._connection
+
+    def hit(self, key, limit, window, now):
+        with self.lock:
+            # IMMEDIATE takes the write lock up front, so two workers can't both see room for one more
+            connection = self.connection
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                self.hits += 1
+                if self.hits % SWEEP_EVERY == 0:
+                    connection.execute('DELETE FROM login_attempts WHERE ts <= ?', (now - window,))
+                connection.execute('DELETE FROM login_attempts WHERE key = ? AND ts <= ?', (key, now - window))
+                count, oldest = connection.execute(
+                    'SELECT COUNT(*), MIN(ts) FROM login_attempts WHERE key = ?', (key,)
+                ).fetchone()
+                if count >= limit:
+                    return oldest + window - now
+                connection.execute('INSERT INTO login_attempts (key, ts) VALUES (?, ?)', (key, now))
+                return 0
+            finally:
+                connection.execute('COMMIT')
+
+    def clear(self, key):
+        with self.lock:
+            self.connection.execute('DELETE FROM login_attempts WHERE key = ?', (key,))
+
+    def tracked_keys(self):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(DISTINCT key) FROM login_attempts').fetchone()[0]
+
+def init_login_throttle(app):
+    app.config.setdefault('TRUSTED_PROXY_COUNT', int(os.environ.get('TRUSTED_PROXY_COUNT', 0)))
+    app.config.setdefault('LOGIN_THROTTLE_ENABLED', os.environ.get('LOGIN_THROTTLE_ENABLED', 'true').lower() == 'true')
+    app.config.setdefault('LOGIN_WINDOW_SECONDS', int(os.environ.get('LOGIN_WINDOW_SECONDS', DEFAULT_WINDOW_SECONDS)))
+    app.config.setdefault('LOGIN_MAX_PER_USERNAME', int(os.environ.get('LOGIN_MAX_PER_USERNAME', DEFAULT_MAX_PER_USERNAME)))
+    app.config.setdefault('LOGIN_MAX_PER_IP', int(os.environ.get('LOGIN_MAX_PER_IP', DEFAULT_MAX_PER_IP)))
+
+    if os.environ.get('LOGIN_THROTTLE_STORE', 'memory').lower() == 'sqlite':
+        os.makedirs(app.instance_path, exist_ok=True)
+        store = SQLiteStore(os.path.join(app.instance_path, SQLITE_FILE))
+    else:
+        store = MemoryStore()
+    app.extensions['login_throttle'] = store
+
+def client_ip():
+    """The address the per-IP limit counts against (see the module docstring)"""
+    if not current_app.config['TRUSTED_PROXY_COUNT'] and 'X-Forwarded-For' in request.headers:
+        if not _stats['untrusted_proxy']:
+            current_app.logger.warning('Login requests carry X-Forwarded-For but TRUSTED_PROXY_COUNT is not set; '
+                                       'if a proxy is in front of the app, all clients share one per-IP login limit')
+        _stats['untrusted_proxy'] += 1
+    return request.remote_addr
+
+def _username_key(username):
+    return 'user:' + ' '.join(username.split()).casefold()
+
+def check_attempt(username, ip):
+    """Count a login attempt; returns seconds the client must wait, or 0 if it may proceed"""
+    config = current_app.config
+    if not config['LOGIN_THROTTLE_ENABLED']:
+        return 0
+    store = current_app.extensions['login_throttle']
+    now = time.time()
+    window = config['LOGIN_WINDOW_SECONDS']
+
+    _stats['attempts'] += 1
+    wait = store.hit('ip:' + (ip or 'unknown'), config['LOGIN_MAX_PER_IP'], window, now)
+    if wait:
+        _stats['throttled_ip'] += 1
+        return wait
+    wait = store.hit(_username_key(username), config['LOGIN_MAX_PER_USERNAME'], window, now)
+    if wait:
+        _stats['throttled_username'] += 1
+    return wait
+
+def login_succeeded(username):
+    if current_app.config['LOGIN_THROTTLE_ENABLED']:
+        current_app.extensions['login_throttle'].clear(_username_key(username))
+
+def stats():
+    store = current_app.extensions['login_throttle']
+    return {
+        'pid': os.getpid(),
+        'store': 'sqlite' if isinstance(store, SQLiteStore) else 'memory',
+        'tracked_keys': store.tracked_keys(),
+        'counters': dict(_stats),
+        'limits': {
+            'window_seconds': current_app.config['LOGIN_WINDOW_SECONDS'],
+            'per_username': current_app.config['LOGIN_MAX_PER_USERNAME'],
+            'per_ip': current_app.config['LOGIN_MAX_PER_IP'],
+        },
+    }
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Database Migration Script
+Applies pending schema migrations (see migrations.py) without downtime: indexes are
+built online where the database supports it and new columns are backfilled in small,
+throttled batches. Safe to interrupt and rerun - it resumes where it stopped.
+"""
+
+import os
+import argparse
+import migrations
+from app import app, db, SchemaMigration
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', migrations.DEFAULT_BATCH_SIZE))
+DEFAULT_PAUSE_SECONDS = float(os.environ.get('MIGRATION_PAUSE_SECONDS', migrations.DEFAULT_PAUSE_SECONDS))
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply pending database schema migrations.')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'rows per backfill transaction (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--pause', type=float, default=DEFAULT_PAUSE_SECONDS,
+                        help=f'seconds to wait between backfill batches (default: {DEFAULT_PAUSE_SECONDS})')
+    parser.add_argument('--status', action='store_true', help='show the schema version and pending migrations only')
+    args = parser.parse_args()
+
+    print("🚀 Database Migration Tool")
+    print(f"Database URL: {os.environ.get('DATABASE_URL', 'Not set')}")
+
+    with app.app_context():
+        SchemaMigration.__table__.create(db.engine, checkfirst=True)
+        print(f"Schema version: {migrations.applied_version()}")
+        pending = migrations.pending_migrations()
+        if not pending:
+            print("✅ Database is up to date")
+            return
+        if args.status:
+            for version, name, _ in pending:
+                print(f"   ⏳ {version}: {name}")
+            return
+
+        applied = migrations.run_migrations(batch_size=args.batch_size, pause=args.pause)
+        print(f"\n🎉 {applied} migration(s) applied, schema version is now {migrations.applied_version()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""
+Versioned schema migrations.
+
+Each migration has a version number and runs once; schema_migrations records which
+versions have been applied. Migrations are written to be safe on both fresh databases
+(where db.create_all() already built the latest schema) and old ones, so every step
+checks before it changes anything.
+
+Indexes are built without blocking writes where the backend allows it (CREATE INDEX
+CONCURRENTLY on PostgreSQL, ALGORITHM=INPLACE LOCK=NONE on MySQL). New columns are
+added as cheap metadata changes and filled by backfill(), which works through the table
+in primary-key batches, one short transaction each, pausing between batches and saving
+its position so an interrupted run picks up where it stopped.
+"""
+
+import time
+from datetime import datetime
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateTable
+from app import (db, Job, JobItem, Expenditure, ArchivedJob, ArchivedJobItem, ArchivedExpenditure,
+                 Customer, SchemaMigration)
+import search
+import changes
+import customers
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_PAUSE_SECONDS = 0.1
+
+MIGRATIONS = []
+
+def migration(version, name):
+    def register(func):
+        MIGRATIONS.append((version, name, func))
+        return func
+    return register
+
+class Context:
+    """Settings and bookkeeping handed to each migration"""
+
+    def __init__(self, record, batch_size, pause):
+        self.record = record
+        self.batch_size = batch_size
+        self.pause = pause
+
+def _dialect():
+    return db.engine.dialect.name
+
+def has_column(table, column):
+    return column in {info['name'] for info in inspect(db.engine).get_columns(table)}
+
+def has_index(table, name):
+    return name in {info['name'] for info in inspect(db.engine).get_indexes(table)}
+
+def add_column(table, column, ddl):
+    """ALTER TABLE ... ADD COLUMN, as an instant/in-place change where supported"""
+    if has_column(table, column):
+        print(f"   ℹ️  {table}.{column} already exists")
+        return
+    db.session.commit()  # DDL must not wait behind our own open transaction
+    statement = f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        if _dialect() == 'mysql':
+            try:
+                connection.execute(db.text(statement + ', ALGORITHM=INSTANT'))
+            except Exception:
+                # INSTANT needs MySQL 8.0.12+; INPLACE still allows concurrent writes
+                connection.execute(db.text(statement + ', ALGORITHM=INPLACE, LOCK=NONE'))
+        else:
+            # Nullable columns and constant defaults are metadata-only on PostgreSQL 11+ and SQLite
+            connection.execute(db.text(statement))
+    print(f"   ✅ Added {table}.{column}")
+
+def create_index(name, table, columns):
+    """CREATE INDEX without blocking writes where the backend supports it"""
+    dialect = _dialect()
+    db.session.commit()  # CONCURRENTLY waits for every open transaction, including ours
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        if dialect == 'postgresql':
+            # A failed CONCURRENTLY build leaves an invalid index behind; drop it and retry
+            valid = connection.execute(db.text(
+                'SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name'
+            ), {'name': name}).scalar()
+            if valid:
+                print(f"   ℹ️  Index {name} already exists")
+                return
+            if valid is False:
+                connection.execute(db.text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+            connection.execute(db.text(f'CREATE INDEX CONCURRENTLY {name} ON {table} ({columns})'))
+        elif has_index(table, name):
+            print(f"   ℹ️  Index {name} already exists")
+            return
+        elif dialect == 'mysql':
+            connection.execute(db.text(f'CREATE INDEX {name} ON {table} ({columns}) ALGORITHM=INPLACE LOCK=NONE'))
+        else:
+            connection.execute(db.text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})'))
+    print(f"   ✅ Created index {name} on {table} ({columns})")
+
+def backfill(context, model, update_batch):
+    """Call update_batch(first_id, last_id) over model's whole id range in batches, committing each"""
+    position = context.record.progress or 0
+    max_id = db.session.query(db.func.max(model.id)).scalar() or 0
+    if position >= max_id:
+        return
+    started = time.time()
+    while position < max_id:
+        batch_end = min(position + context.batch_size, max_id)
+        update_batch(position + 1, batch_end)
+        position = batch_end
+        context.record.progress = position  # Saved with the batch, so a rerun resumes here
+        db.session.commit()
+
+        print(f"   ...{model.__tablename__}: id {position}/{max_id} "
+              f"({position / max_id:.0%}, {time.time() - started:.0f}s)")
+        if context.pause:
+            time.sleep(context.pause)
+
+def _max_id(table):
+    return db.session.execute(db.select(db.func.max(table.c.id))).scalar() or 0
+
+def renumber_reused_ids(model, archive_model, entity, children=()):
+    """Move live rows whose id is also taken in the archive to fresh ids; returns how many moved"""
+    table, archive = model.__table__, archive_model.__table__
+    reused = [row_id for row_id, in db.session.execute(
+        db.select(table.c.id).where(table.c.id.in_(db.select(archive.c.id))).order_by(table.c.id)
+    )]
+    next_id = max(_max_id(table), _max_id(archive)) + 1
+    for old_id in reused:
+        db.session.execute(table.update().where(table.c.id == old_id).values(id=next_id))
+        for column, child_entity in children:
+            child_ids = [row_id for row_id, in db.session.execute(
+                db.select(column.table.c.id).where(column == old_id))]
+            db.session.execute(column.table.update().where(column == old_id).values({column.name: next_id}))
+            changes.record(child_entity, child_ids)
+        # Sync clients drop the old id and pick the row up under its new one
+        changes.record(entity, [old_id], action='delete')
+        changes.record(entity, [next_id])
+        next_id += 1
+    db.session.commit()
+    if reused:
+        print(f"   ✅ Renumbered {len(reused)} {table.name} row(s) whose id was already archived")
+    return len(reused)
+
+def sqlite_autoincrement(model, archive_model):
+    """SQLite: recreate the table with AUTOINCREMENT, so deleted or archived ids are never handed out again"""
+    table = model.__table__
+    db.session.commit()
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        table_sql = connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+        ).scalar()
+        if 'AUTOINCREMENT' in table_sql.upper():
+            print(f"   ℹ️  {table.name} already uses AUTOINCREMENT")
+            return
+        index_sql = [row[0] for row in connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table.name,)
+        )]
+        # A copy named <table>_new, with the tables its foreign keys point at alongside it
+        metadata = db.MetaData()
+        for foreign_key in table.foreign_keys:
+            foreign_key.column.table.to_metadata(metadata)
+        new_table = table.to_metadata(metadata, name=f'{table.name}_new')
+        columns = ', '.join(column.name for column in table.columns)
+        floor = max(_max_id(table), _max_id(archive_model.__table__))
+
+        # SQLite can't add AUTOINCREMENT in place: copy, drop, rename in one transaction
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+        try:
+            connection.execute(CreateTable(new_table))
+            connection.exec_driver_sql(f'INSERT INTO {new_table.name} ({columns}) SELECT {columns} FROM {table.name}')
+            connection.exec_driver_sql(f'DROP TABLE {table.name}')
+            connection.exec_driver_sql(f'ALTER TABLE {new_table.name} RENAME TO {table.name}')
+            for statement in index_sql:
+                connection.exec_driver_sql(statement)
+            # Start above the archive too, so ids archived before this migration stay retired
+            connection.exec_driver_sql('DELETE FROM sqlite_sequence WHERE name = ?', (table.name,))
+            connection.exec_driver_sql('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table.name, floor))
+            connection.exec_driver_sql('COMMIT')
+        except Exception:
+            connection.exec_driver_sql('ROLLBACK')
+            raise
+    print(f"   ✅ Rebuilt {table.name} with AUTOINCREMENT (next id {floor + 1})")
+
+# Migrations
+@migration(1, 'Baseline schema')
+def baseline(context):
+    # Tables added since the last deploy; existing tables are left alone
+    db.create_all()
+
+@migration(2, 'Indexes for job items and date filters')
+def date_and_item_indexes(context):
+    create_index('ix_job_items_job_id', 'job_items', 'job_id')
+    create_index('ix_jobs_date_time', 'jobs', 'date_time')
+    create_index('ix_expenditures_date_time', 'expenditures', 'date_time')
+
+@migration(3, 'jobs.customer_key for customer lookups')
+def job_customer_key(context):
+    add_column('jobs', 'customer_key', 'VARCHAR(100)')
+
+    def update_batch(first_id, last_id):
+        rows = db.session.query(Job.id, Job.customer_name).filter(
+            Job.id.between(first_id, last_id), Job.customer_key.is_(None)
+        ).all()
+        if rows:
+            db.session.execute(
+                db.update(Job.__table__).where(Job.__table__.c.id == db.bindparam('job_id')).values(
+                    customer_key=db.bindparam('key')
+                ),
+                [{'job_id': job_id, 'key': Customer.key_for(name)} for job_id, name in rows]
+            )
+
+    backfill(context, Job, update_batch)
+    create_index('ix_jobs_customer_key', 'jobs', 'customer_key')
+
+@migration(4, 'Version columns for optimistic concurrency')
+def edit_versions(context):
+    # A constant default fills existing rows without a backfill pass
+    add_column('jobs', 'version', 'INTEGER NOT NULL DEFAULT 1')
+    add_column('expenditures', 'version', 'INTEGER NOT NULL DEFAULT 1')
+
+@migration(5, 'SQLite search index')
+def sqlite_search_index(context):
+    # Rebuilt from scratch: the index used to be filled lazily inside a request, and a
+    # rolled-back request could leave it created but missing every existing row
+    if _dialect() == 'sqlite':
+        search.rebuild_search_index()
+        print(f"   ✅ Built {search.SEARCH_TABLE}")
+
+@migration(6, 'Never reuse job and expenditure ids')
+def non_reusable_ids(context):
+    # SQLite hands out max(id) + 1, so archiving the newest row let its id come back and
+    # collide with the archived copy, the change feed and the search index. PostgreSQL
+    # sequences and MySQL 8 AUTO_INCREMENT never go backwards.
+    if _dialect() != 'sqlite':
+        return
+    renumbered = renumber_reused_ids(Job, ArchivedJob, 'job', children=[(JobItem.__table__.c.job_id, 'job_item')])
+    renumbered += renumber_reused_ids(JobItem, ArchivedJobItem, 'job_item')
+    renumbered += renumber_reused_ids(Expenditure, ArchivedExpenditure, 'expenditure')
+    if renumbered:
+        search.rebuild_search_index()
+    for model, archive_model in ((Job, ArchivedJob), (JobItem, ArchivedJobItem), (Expenditure, ArchivedExpenditure)):
+        sqlite_autoincrement(model, archive_model)
+
+@migration(7, 'Customer totals backfill and prefix index')
+def customer_totals(context):
+    # Autocomplete's LIKE 'prefix%' needs a pattern-ordered index outside the C locale on
+    # PostgreSQL, and a NOCASE one on SQLite; MySQL uses the plain name_key index
+    if _dialect() == 'postgresql':
+        create_index('ix_customers_name_key_pattern', 'customers', 'name_key text_pattern_ops')
+    elif _dialect() == 'sqlite':
+        create_index('ix_customers_name_key_pattern', 'customers', 'name_key COLLATE NOCASE')
+
+    archived = customers.archived_totals()
+    created = customers.ensure_customer_rows(archived, context.batch_size)
+    print(f"   ✅ {created} customers created")
+    backfill(context, Customer, lambda first_id, last_id: customers.refresh_customers(first_id, last_id, archived))
+
+# Runner
+def applied_version():
+    return db.session.query(db.func.max(SchemaMigration.version)).filter(
+        SchemaMigration.applied_at.isnot(None)
+    ).scalar() or 0
+
+def pending_migrations():
+    current = applied_version()
+    return [(version, name, func) for version, name, func in sorted(MIGRATIONS) if version > current]
+
+def run_migrations(batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_PAUSE_SECONDS):
+    """Apply every pending migration in order; returns how many were applied"""
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+    pending = pending_migrations()
+    for version, name, func in pending:
+        print(f"🔨 Migration {version}: {name}")
+        record = db.session.get(SchemaMigration, version)
+        if record is None:
+            record = SchemaMigration(version=version, name=name, started_at=datetime.now())
+            db.session.add(record)
+            db.session.commit()
+        elif record.progress:
+            print(f"   ↪️  Resuming from id {record.progress}")
+
+        func(Context(record, batch_size, pause))
+        record.applied_at = datetime.now()
+        db.session.commit()
+        print(f"✅ Migration {version} applied")
+    return len(pending)
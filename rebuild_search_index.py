@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Search Index Rebuild Script
+Recreates the full-text search index (SQLite FTS5 table, or the native
+full-text indexes on MySQL/PostgreSQL) from the live tables.
+"""
+
+import os
+from app import app, db
+from search import rebuild_search_index
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+if __name__ == '__main__':
+    print("🚀 Search Index Rebuild Tool")
+    print(f"Database URL: {os.environ.get('DATABASE_URL', 'Not set')}")
+
+    with app.app_context():
+        print("🔨 Rebuilding search index...")
+        rebuild_search_index()
+        print(f"✅ Search index rebuilt ({db.engine.dialect.name})")
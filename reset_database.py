@@ -6,6 +6,9 @@ USE WITH CAUTION: This will delete all existing data!
 
 import os
 from app import app, db
+import scheduler
+import search
+import compression
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -27,6 +30,11 @@ def reset_database():
         
         print("🔨 Creating new tables with updated schema...")
         db.create_all()
+        # The search index is not a model table, so drop_all() leaves it behind
+        search.rebuild_search_index()
+        # Precomputed figures and stored exports belong to the old data
+        scheduler.clear()
+        compression.clear_artifacts()
         print("✅ New tables created successfully!")
         
         return True
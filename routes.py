@@ -1,15 +1,46 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify, session, send_file
+from flask import render_template, request, redirect, url_for, flash, jsonify, session, send_file, make_response
 from flask_login import login_user, login_required, logout_user, current_user
 from datetime import datetime, timedelta
+import math
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import seaborn as sns
 from io import BytesIO
 import base64
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
-from app import app, db, User, Job, JobItem, Expenditure, admin_required
+import search
+import customers
+import compression
+import analytics
+import changes
+import scheduler
+import warmup
+import login_throttle
+from app import app, db, User, Job, JobItem, Expenditure, Customer, ChangeLog, ArchivedJob, ArchivedJobItem, ArchivedExpenditure, admin_required
+
+# Health Check Routes
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: the worker is warmed up and the database answers"""
+    if not warmup.is_ready():
+        warmup.warm_up_in_background(app)
+        return jsonify({'status': 'warming up'}), 503
+    try:
+        db.session.execute(db.text('SELECT 1'))
+    except Exception:
+        db.session.rollback()
+        # The endpoint is public; driver errors can name hosts and users, so they only go to the log
+        app.logger.exception('Readiness check: database unavailable')
+        return jsonify({'status': 'database unavailable'}), 503
+    return jsonify({'status': 'ready'})
 
 # Authentication Routes
 @app.route('/')
@@ -23,9 +54,19 @@ def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
+        
+        # Checked before the user lookup and password hash, which are what an attacker wants to burn
+        wait = login_throttle.check_attempt(username, login_throttle.client_ip())
+        if wait:
+            flash('Too many login attempts. Please try again later.', 'error')
+            response = make_response(render_template('login.html'), 429)
+            response.headers['Retry-After'] = str(math.ceil(wait))
+            return response
+        
         user = User.query.filter_by(username=username).first()
         
         if user and user.check_password(password):
+            login_throttle.login_succeeded(username)
             login_user(user)
             return redirect(url_for('dashboard'))
         else:
@@ -60,6 +101,7 @@ def change_password():
             return render_template('change_password.html')
         
         current_user.set_password(new_password)
+        changes.record('user', [current_user.id])
         db.session.commit()
         flash('Password changed successfully!', 'success')
         return redirect(url_for('dashboard'))
@@ -104,6 +146,8 @@ def create_user():
         new_user = User(username=username, role=role)
         new_user.set_password(password)
         db.session.add(new_user)
+        db.session.flush()  # Get the user ID
+        changes.record('user', [new_user.id])
         db.session.commit()
         flash(f'User "{username}" created successfully!', 'success')
     except Exception as e:
@@ -130,6 +174,7 @@ def update_user_role(user_id):
     
     try:
         user.role = new_role
+        changes.record('user', [user.id])
         db.session.commit()
         flash(f'User "{user.username}" role updated to {new_role}.', 'success')
     except Exception as e:
@@ -150,6 +195,7 @@ def delete_user(user_id):
         return redirect(url_for('users'))
     
     try:
+        changes.record('user', [user.id], action='delete')
         db.session.delete(user)
         db.session.commit()
         flash(f'User "{user.username}" deleted successfully.', 'success')
@@ -164,63 +210,8 @@ def delete_user(user_id):
 @login_required
 def dashboard():
     today = datetime.now().date()
-    week_start = today - timedelta(days=today.weekday())
-    month_start = today.replace(day=1)
-    
-    # Jobs statistics
-    jobs_today = Job.query.filter(
-        db.func.date(Job.date_time) == today
-    ).count()
-    
-    jobs_today_completed = Job.query.filter(
-        db.func.date(Job.date_time) == today,
-        Job.status == 'Completed'
-    ).count()
-    
-    jobs_week = Job.query.filter(
-        db.func.date(Job.date_time) >= week_start,
-        Job.status == 'Completed'
-    ).count()
-    
-    jobs_month = Job.query.filter(
-        db.func.date(Job.date_time) >= month_start,
-        Job.status == 'Completed'
-    ).count()
-    
-    incomplete_jobs = Job.query.filter(Job.status == 'Incomplete').count()
-    
-    # Expenditure statistics
-    expenditures_today = db.session.query(db.func.sum(Expenditure.total)).filter(
-        db.func.date(Expenditure.date_time) == today
-    ).scalar() or 0
-    
-    expenditures_month = db.session.query(db.func.sum(Expenditure.total)).filter(
-        db.func.date(Expenditure.date_time) >= month_start
-    ).scalar() or 0
-    
-    # Revenue statistics
-    revenue_month = db.session.query(db.func.sum(JobItem.total)).join(Job).filter(
-        db.func.date(Job.date_time) >= month_start,
-        Job.status == 'Completed'
-    ).scalar() or 0
-    
-    net_balance = revenue_month - expenditures_month
-    
-    # Generate monthly chart
-    chart_data = generate_monthly_chart()
-    
-    return render_template('dashboard.html', 
-                         jobs_today=jobs_today,
-                         jobs_today_completed=jobs_today_completed,
-                         jobs_week=jobs_week,
-                         jobs_month=jobs_month,
-                         incomplete_jobs=incomplete_jobs,
-                         expenditures_today=expenditures_today,
-                         expenditures_month=expenditures_month,
-                         revenue_month=revenue_month,
-                         net_balance=net_balance,
-                         chart_data=chart_data,
-                         datetime=datetime)
+    stats = cached_dashboard_stats(today)
+    return render_template('dashboard.html', datetime=datetime, **stats)
 
 # Jobs Routes
 @app.route('/jobs')
@@ -229,18 +220,23 @@ def jobs():
     filter_type = request.args.get('filter', 'today')
     today = datetime.now().date()
     
-    query = Job.query
+    query = apply_period_filter(Job.query, Job.date_time, filter_type, today)
     
-    if filter_type == 'today':
-        query = query.filter(db.func.date(Job.date_time) == today)
-    elif filter_type == 'week':
-        week_start = today - timedelta(days=today.weekday())
-        query = query.filter(db.func.date(Job.date_time) >= week_start)
-    elif filter_type == 'month':
-        month_start = today.replace(day=1)
-        query = query.filter(db.func.date(Job.date_time) >= month_start)
+    # Summary rows only - item counts and totals are aggregated in one pass over the
+    # filtered jobs' items, the items themselves are fetched from /get_job when a job's modal opens
+    item_totals = db.session.query(
+        JobItem.job_id,
+        db.func.count(JobItem.id).label('item_count'),
+        db.func.sum(JobItem.total).label('total_amount')
+    ).filter(
+        JobItem.job_id.in_(query.with_entities(Job.id))
+    ).group_by(JobItem.job_id).subquery()
     
-    jobs = query.order_by(Job.date_time.desc()).all()
+    jobs = query.outerjoin(item_totals, item_totals.c.job_id == Job.id).with_entities(
+        Job,
+        db.func.coalesce(item_totals.c.item_count, 0),
+        db.func.coalesce(item_totals.c.total_amount, 0)
+    ).options(db.joinedload(Job.creator)).order_by(Job.date_time.desc()).all()
     
     return render_template('jobs.html', jobs=jobs, filter_type=filter_type, today=today)
 
@@ -271,6 +267,9 @@ def add_job():
         quantities = request.form.getlist('quantity[]')
         prices = request.form.getlist('price[]')
         
+        item_descriptions = []
+        new_items = []
+        items_total = 0
         for desc, qty, price in zip(descriptions, quantities, prices):
             if desc and qty and price:
                 quantity = float(qty)
@@ -285,8 +284,17 @@ def add_job():
                     total=total
                 )
                 db.session.add(item)
+                new_items.append(item)
+                item_descriptions.append(desc)
+                items_total += total
         
+        db.session.flush()  # Get the item IDs
+        changes.record('job', [job.id])
+        changes.record('job_item', [item.id for item in new_items])
+        search.index_job(job.id, job.customer_name, item_descriptions)
+        customers.job_added(customers.snapshot(job, total=items_total))
         db.session.commit()
+        invalidate_exports('jobs', job.date_time.date())
         flash('Job added successfully', 'success')
         
     except Exception as e:
@@ -301,6 +309,10 @@ def add_job():
 def edit_job(job_id):
     try:
         job = Job.query.get_or_404(job_id)
+        expected_version = request.form.get('version', type=int)
+        if expected_version is None:
+            flash(EDIT_STALE_FORM_MESSAGE, 'error')
+            return redirect(url_for('jobs'))
         
         payment_method = request.form['payment_method']
         
@@ -309,11 +321,25 @@ def edit_job(job_id):
             flash('Invalid payment method selected', 'error')
             return redirect(url_for('jobs'))
         
-        job.customer_name = request.form['customer_name']
-        job.status = request.form['status']
-        job.payment_method = payment_method
+        old_total = db.session.query(db.func.coalesce(db.func.sum(JobItem.total), 0)).filter(
+            JobItem.job_id == job.id
+        ).scalar()
+        old_contribution = customers.snapshot(job, total=old_total)
+        
+        customer_name = request.form['customer_name']
+        if not claim_version(Job, job.id, expected_version, {
+            Job.customer_name: customer_name,
+            Job.customer_key: Customer.key_for(customer_name),
+            Job.status: request.form['status'],
+            Job.payment_method: payment_method,
+        }):
+            db.session.rollback()
+            flash(EDIT_CONFLICT_MESSAGE.format('job'), 'error')
+            return redirect(url_for('jobs'))
         
         # Delete existing items
+        old_item_ids = [item_id for item_id, in db.session.query(JobItem.id).filter_by(job_id=job.id)]
+        changes.record('job_item', old_item_ids, action='delete')
         JobItem.query.filter_by(job_id=job.id).delete()
         
         # Add new items
@@ -321,6 +347,9 @@ def edit_job(job_id):
         quantities = request.form.getlist('quantity[]')
         prices = request.form.getlist('price[]')
         
+        item_descriptions = []
+        new_items = []
+        items_total = 0
         for desc, qty, price in zip(descriptions, quantities, prices):
             if desc and qty and price:
                 quantity = float(qty)
@@ -335,8 +364,18 @@ def edit_job(job_id):
                     total=total
                 )
                 db.session.add(item)
+                new_items.append(item)
+                item_descriptions.append(desc)
+                items_total += total
         
+        db.session.flush()  # Get the item IDs
+        changes.record('job', [job.id])
+        changes.record('job_item', [item.id for item in new_items])
+        search.index_job(job.id, job.customer_name, item_descriptions)
+        customers.job_removed(old_contribution, job.id)
+        customers.job_added(customers.snapshot(job, total=items_total))
         db.session.commit()
+        invalidate_exports('jobs', job.date_time.date())
         flash('Job updated successfully', 'success')
         
     except Exception as e:
@@ -351,8 +390,14 @@ def edit_job(job_id):
 def delete_job(job_id):
     try:
         job = Job.query.get_or_404(job_id)
+        search.remove_jobs([job.id])
+        customers.job_removed(customers.snapshot(job), job.id)
+        changes.record('job_item', [item.id for item in job.items], action='delete')
+        changes.record('job', [job.id], action='delete')
+        job_date = job.date_time.date()
         db.session.delete(job)
         db.session.commit()
+        invalidate_exports('jobs', job_date)
         flash('Job deleted successfully', 'success')
     except Exception as e:
         db.session.rollback()
@@ -360,6 +405,36 @@ def delete_job(job_id):
     
     return redirect(url_for('jobs'))
 
+@app.route('/jobs/bulk', methods=['POST'])
+@login_required
+@admin_required
+def bulk_jobs():
+    filter_type = request.form.get('filter', 'today')
+    action, _, value = request.form.get('operation', '').partition(':')
+    job_ids = [int(job_id) for job_id in request.form.getlist('job_ids[]') if job_id.isdigit()]
+    
+    if not job_ids:
+        flash('No jobs selected', 'error')
+        return redirect(url_for('jobs', filter=filter_type))
+    
+    try:
+        if action == 'status' and value in ['Completed', 'Incomplete']:
+            affected = bulk_update_jobs(job_ids, Job.status, value)
+            flash(f'{affected} job(s) marked {value}', 'success')
+        elif action == 'payment_method' and value in ['Cash', 'Transfer']:
+            affected = bulk_update_jobs(job_ids, Job.payment_method, value)
+            flash(f'{affected} job(s) set to {value}', 'success')
+        elif action == 'delete':
+            affected, items_deleted = bulk_delete_jobs(job_ids)
+            flash(f'{affected} job(s) and {items_deleted} item(s) deleted', 'success')
+        else:
+            flash('Invalid bulk action selected', 'error')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error updating jobs: {str(e)}', 'error')
+    
+    return redirect(url_for('jobs', filter=filter_type))
+
 @app.route('/get_job/<int:job_id>')
 @login_required
 def get_job(job_id):
@@ -369,6 +444,7 @@ def get_job(job_id):
         'customer_name': job.customer_name,
         'status': job.status,
         'payment_method': job.payment_method,
+        'version': job.version,
         'items': [{
             'description': item.description,
             'quantity': item.quantity,
@@ -377,6 +453,17 @@ def get_job(job_id):
         } for item in job.items]
     })
 
+@app.route('/customers/autocomplete')
+@login_required
+def customer_autocomplete():
+    matches = customers.autocomplete(request.args.get('q', ''))
+    return jsonify([{
+        'name': customer.name,
+        'job_count': customer.job_count,
+        'lifetime_revenue': customer.lifetime_revenue,
+        'last_visit': customer.last_visit.strftime('%Y-%m-%d') if customer.last_visit else None
+    } for customer in matches])
+
 # Expenditures Routes
 @app.route('/expenditures')
 @login_required
@@ -384,17 +471,7 @@ def expenditures():
     filter_type = request.args.get('filter', 'today')
     today = datetime.now().date()
     
-    query = Expenditure.query
-    
-    if filter_type == 'today':
-        query = query.filter(db.func.date(Expenditure.date_time) == today)
-    elif filter_type == 'week':
-        week_start = today - timedelta(days=today.weekday())
-        query = query.filter(db.func.date(Expenditure.date_time) >= week_start)
-    elif filter_type == 'month':
-        month_start = today.replace(day=1)
-        query = query.filter(db.func.date(Expenditure.date_time) >= month_start)
-    
+    query = apply_period_filter(Expenditure.query, Expenditure.date_time, filter_type, today)
     expenditures = query.order_by(Expenditure.date_time.desc()).all()
     
     return render_template('expenditures.html', expenditures=expenditures, filter_type=filter_type, today=today)
@@ -417,7 +494,11 @@ def add_expenditure():
         )
         
         db.session.add(expenditure)
+        db.session.flush()  # Get the expenditure ID
+        changes.record('expenditure', [expenditure.id])
+        search.index_expenditure(expenditure.id, expenditure.description)
         db.session.commit()
+        invalidate_exports('expenditures', expenditure.date_time.date())
         flash('Expenditure added successfully', 'success')
         
     except Exception as e:
@@ -432,13 +513,27 @@ def add_expenditure():
 def edit_expenditure(expenditure_id):
     try:
         expenditure = Expenditure.query.get_or_404(expenditure_id)
+        expected_version = request.form.get('version', type=int)
+        if expected_version is None:
+            flash(EDIT_STALE_FORM_MESSAGE, 'error')
+            return redirect(url_for('expenditures'))
         
-        expenditure.description = request.form['description']
-        expenditure.quantity = float(request.form['quantity'])
-        expenditure.amount_used = float(request.form['amount_used'])
-        expenditure.total = expenditure.quantity * expenditure.amount_used
+        quantity = float(request.form['quantity'])
+        amount_used = float(request.form['amount_used'])
+        if not claim_version(Expenditure, expenditure.id, expected_version, {
+            Expenditure.description: request.form['description'],
+            Expenditure.quantity: quantity,
+            Expenditure.amount_used: amount_used,
+            Expenditure.total: quantity * amount_used,
+        }):
+            db.session.rollback()
+            flash(EDIT_CONFLICT_MESSAGE.format('expenditure'), 'error')
+            return redirect(url_for('expenditures'))
         
+        changes.record('expenditure', [expenditure.id])
+        search.index_expenditure(expenditure.id, expenditure.description)
         db.session.commit()
+        invalidate_exports('expenditures', expenditure.date_time.date())
         flash('Expenditure updated successfully', 'success')
         
     except Exception as e:
@@ -453,8 +548,12 @@ def edit_expenditure(expenditure_id):
 def delete_expenditure(expenditure_id):
     try:
         expenditure = Expenditure.query.get_or_404(expenditure_id)
+        search.remove_expenditures([expenditure.id])
+        changes.record('expenditure', [expenditure.id], action='delete')
+        expenditure_date = expenditure.date_time.date()
         db.session.delete(expenditure)
         db.session.commit()
+        invalidate_exports('expenditures', expenditure_date)
         flash('Expenditure deleted successfully', 'success')
     except Exception as e:
         db.session.rollback()
@@ -471,72 +570,434 @@ def get_expenditure(expenditure_id):
         'description': expenditure.description,
         'quantity': expenditure.quantity,
         'amount_used': expenditure.amount_used,
-        'total': expenditure.total
+        'total': expenditure.total,
+        'version': expenditure.version
     })
 
+# Search Route
+@app.route('/search')
+@login_required
+def search_records():
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = 20
+    
+    results, total = search.search(query, page=page, per_page=per_page) if query else ([], 0)
+    
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'query': query,
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'results': [{
+                'kind': result['kind'],
+                'id': result['record'].id,
+                'title': result['record'].customer_name if result['kind'] == 'job' else result['record'].description,
+                'date_time': result['record'].date_time.strftime('%Y-%m-%d %I:%M %p'),
+                'score': result['score']
+            } for result in results]
+        })
+    
+    pages = (total + per_page - 1) // per_page
+    return render_template('search.html', query=query, results=results, total=total, page=page, pages=pages)
+
+# Change Feed Route
+@app.route('/api/changes')
+@login_required
+def api_changes():
+    """Incremental sync: everything changed after sequence number `since`"""
+    # since=latest starts a new client at the current head, without paging through the log
+    since = changes.head() if request.args.get('since') == 'latest' else request.args.get('since', 0, type=int)
+    limit = min(request.args.get('limit', changes.DEFAULT_BATCH_SIZE, type=int), changes.MAX_BATCH_SIZE)
+    if since < 0 or limit < 1:
+        return jsonify({'error': 'since must be >= 0 and limit >= 1'}), 400
+
+    # User accounts are only visible to admins, as on the users page
+    entities = None if current_user.is_admin() else [entity for entity in changes.ENTITIES if entity != 'user']
+    return jsonify(changes.changes_since(since, limit=limit, entities=entities))
+
 # Reports Routes
+@app.route('/admin/cache_stats')
+@login_required
+@admin_required
+def cache_stats():
+    return jsonify(scheduler.stats())
+
+@app.route('/admin/login_throttle')
+@login_required
+@admin_required
+def login_throttle_stats():
+    return jsonify(login_throttle.stats())
+
 @app.route('/reports')
 @login_required
 def reports():
     return render_template('reports.html')
 
-@app.route('/export_jobs')
+@app.route('/reports/pnl')
 @login_required
-def export_jobs():
-    filter_type = request.args.get('filter', 'all')
-    format_type = request.args.get('format', 'excel')
+def profit_and_loss():
+    period = request.args.get('period', 'month')
+    if period not in analytics.PERIODS:
+        period = 'month'
     
     today = datetime.now().date()
-    query = Job.query
+    default_start = (today.replace(day=1) - timedelta(days=335)).replace(day=1)  # Last 12 months
+    try:
+        start_date = datetime.strptime(request.args.get('start', ''), '%Y-%m-%d').date()
+    except ValueError:
+        start_date = default_start
+    try:
+        end_date = datetime.strptime(request.args.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        end_date = today
+    
+    if end_date < start_date:
+        flash('End date must be on or after the start date.', 'error')
+        start_date, end_date = default_start, today
+    
+    start = datetime.combine(start_date, datetime.min.time())
+    end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    report = analytics.pnl_report(
+        start, end, period,
+        include_archived_jobs=archive_needed(ArchivedJob, start_date),
+        include_archived_expenditures=archive_needed(ArchivedExpenditure, start_date)
+    )
+    totals = analytics.report_totals(report)
+    
+    if request.args.get('format') == 'json':
+        rows = report.reset_index()
+        rows['period'] = rows['period'].dt.strftime('%Y-%m-%d')
+        return jsonify({
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat(),
+            'period': period,
+            'periods': rows.to_dict(orient='records'),
+            'totals': {key: float(value) for key, value in totals.items()}
+        })
     
-    if filter_type == 'today':
-        query = query.filter(db.func.date(Job.date_time) == today)
-    elif filter_type == 'week':
-        week_start = today - timedelta(days=today.weekday())
-        query = query.filter(db.func.date(Job.date_time) >= week_start)
-    elif filter_type == 'month':
-        month_start = today.replace(day=1)
-        query = query.filter(db.func.date(Job.date_time) >= month_start)
+    return render_template('pnl.html', report=report, totals=totals, period=period,
+                           start_date=start_date, end_date=end_date)
+
+@app.route('/export_jobs')
+@login_required
+def export_jobs():
+    filter_type = request.args.get('filter', 'all')
+    format_type = 'excel' if request.args.get('format', 'excel') == 'excel' else 'pdf'
     
-    jobs = query.order_by(Job.date_time.desc()).all()
+    include_archive = request.args.get('archive', '1') != '0'
     
-    if format_type == 'excel':
-        return export_jobs_excel(jobs, filter_type)
-    else:
-        return export_jobs_pdf(jobs, filter_type)
+    today = datetime.now().date()
+    if include_archive:
+        cached = send_cached_export('jobs', filter_type, format_type, today)
+        if cached is not None:
+            return cached
+    
+    version = data_version()  # Read before the rows, see store_export()
+    jobs = export_rows('jobs', filter_type, today, include_archive)
+    buffer = build_export('jobs', format_type, jobs, filter_type)
+    return send_export(buffer, 'jobs', filter_type, format_type, version if include_archive else None)
 
 @app.route('/export_expenditures')
 @login_required
 def export_expenditures():
     filter_type = request.args.get('filter', 'all')
-    format_type = request.args.get('format', 'excel')
+    format_type = 'excel' if request.args.get('format', 'excel') == 'excel' else 'pdf'
     
-    today = datetime.now().date()
-    query = Expenditure.query
+    include_archive = request.args.get('archive', '1') != '0'
     
+    today = datetime.now().date()
+    if include_archive:
+        cached = send_cached_export('expenditures', filter_type, format_type, today)
+        if cached is not None:
+            return cached
+    
+    version = data_version()  # Read before the rows, see store_export()
+    expenditures = export_rows('expenditures', filter_type, today, include_archive)
+    buffer = build_export('expenditures', format_type, expenditures, filter_type)
+    return send_export(buffer, 'expenditures', filter_type, format_type, version if include_archive else None)
+
+# Helper Functions
+def period_start(filter_type, today):
+    """First date covered by a today/yesterday/week/month filter (None means all time)"""
     if filter_type == 'today':
-        query = query.filter(db.func.date(Expenditure.date_time) == today)
+        return today
+    elif filter_type == 'yesterday':
+        return today - timedelta(days=1)
     elif filter_type == 'week':
-        week_start = today - timedelta(days=today.weekday())
-        query = query.filter(db.func.date(Expenditure.date_time) >= week_start)
+        return today - timedelta(days=today.weekday())
     elif filter_type == 'month':
-        month_start = today.replace(day=1)
-        query = query.filter(db.func.date(Expenditure.date_time) >= month_start)
+        return today.replace(day=1)
+    return None
+
+def apply_period_filter(query, column, filter_type, today):
+    start = period_start(filter_type, today)
+    if start is None:
+        return query
+    # Plain range comparisons (not DATE(column)) so the date_time indexes are used
+    start = datetime.combine(start, datetime.min.time())
+    if filter_type in ('today', 'yesterday'):
+        return query.filter(column >= start, column < start + timedelta(days=1))
+    return query.filter(column >= start)
+
+def period_covers(filter_type, today, day):
+    start = period_start(filter_type, today)
+    if filter_type in ('today', 'yesterday'):
+        return day == start
+    return start is None or day >= start
+
+def archive_horizon(archive_model):
+    """Date/time of the newest archived row, or None when the archive is empty"""
+    return db.session.query(db.func.max(archive_model.date_time)).scalar()
+
+def archive_needed(archive_model, start_date):
+    horizon = archive_horizon(archive_model)
+    if horizon is None:
+        return False
+    return start_date is None or horizon.date() >= start_date
+
+EXPORT_FORMATS = {
+    'excel': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'pdf': ('application/pdf', 'pdf'),
+}
+CACHEABLE_EXPORT_FILTERS = ('today', 'yesterday', 'week', 'month', 'all')
+EXPORT_MODELS = {
+    'jobs': (Job, ArchivedJob),
+    'expenditures': (Expenditure, ArchivedExpenditure),
+}
+
+def export_rows(kind, filter_type, today, include_archive=True):
+    model, archive_model = EXPORT_MODELS[kind]
+    query = apply_period_filter(model.query, model.date_time, filter_type, today)
+    rows = query.order_by(model.date_time.desc()).all()
+    
+    # Only touch the archive when the requested range reaches into it.
+    # Archived rows are all older than live ones, so appending keeps the newest-first order.
+    if include_archive and archive_needed(archive_model, period_start(filter_type, today)):
+        query = apply_period_filter(archive_model.query, archive_model.date_time, filter_type, today)
+        rows.extend(query.order_by(archive_model.date_time.desc()).all())
+    return rows
+
+def build_export(kind, format_type, rows, filter_type):
+    if kind == 'jobs':
+        return export_jobs_excel(rows, filter_type) if format_type == 'excel' else export_jobs_pdf(rows, filter_type)
+    return export_expenditures_excel(rows, filter_type) if format_type == 'excel' else export_expenditures_pdf(rows, filter_type)
+
+def export_artifact_name(kind, filter_type, format_type, day):
+    return f'{kind}_{filter_type}_{format_type}_{day.strftime("%Y%m%d")}'
+
+def export_download_name(kind, filter_type, format_type, day):
+    return f'{kind}_{filter_type}_{day.strftime("%Y%m%d")}.{EXPORT_FORMATS[format_type][1]}'
+
+def send_cached_export(kind, filter_type, format_type, today):
+    """Serve today's precompressed export if one is stored, else None"""
+    if filter_type not in CACHEABLE_EXPORT_FILTERS:
+        return None
+    response = compression.send_artifact(
+        export_artifact_name(kind, filter_type, format_type, today),
+        EXPORT_FORMATS[format_type][0],
+        export_download_name(kind, filter_type, format_type, today)
+    )
+    scheduler.count('exports', hit=response is not None)
+    return response
+
+def send_export(buffer, kind, filter_type, format_type, version=None):
+    """Send an export; with the data version its rows were read at, also keep it for later requests"""
+    today = datetime.now().date()
+    mimetype = EXPORT_FORMATS[format_type][0]
+    download_name = export_download_name(kind, filter_type, format_type, today)
     
-    expenditures = query.order_by(Expenditure.date_time.desc()).all()
+    if version is not None and filter_type in CACHEABLE_EXPORT_FILTERS:
+        name = store_export(buffer, kind, filter_type, format_type, today, version)
+        response = compression.send_artifact(name, mimetype, download_name) if name else None
+        if response is not None:
+            return response
     
-    if format_type == 'excel':
-        return export_expenditures_excel(expenditures, filter_type)
-    else:
-        return export_expenditures_pdf(expenditures, filter_type)
+    buffer.seek(0)
+    return send_file(buffer, mimetype=mimetype, as_attachment=True, download_name=download_name)
+
+def store_export(buffer, kind, filter_type, format_type, today, version):
+    """Store an export built from rows read at data `version`; returns its name, or None if
+    a write landed meanwhile. That write's invalidate_exports() may have run before the file
+    existed, so the export is dropped here instead of being served with the write missing."""
+    name = export_artifact_name(kind, filter_type, format_type, today)
+    compression.store_artifact(name, buffer.getvalue(), EXPORT_FORMATS[format_type][0])
+    if data_version() != version:
+        compression.remove_artifact(name)
+        return None
+    return name
+
+EDIT_CONFLICT_MESSAGE = ('This {} was changed by someone else while you were editing it. '
+                         'Your changes were not saved - please open it again and retry.')
+# Forms opened before version checks existed, or clients that don't send the field
+EDIT_STALE_FORM_MESSAGE = 'Your changes were not saved because the page is out of date. Please reload it and try again.'
+
+def claim_version(model, record_id, expected_version, values):
+    """Optimistic concurrency: UPDATE ... WHERE version = expected_version, bumping the version.
+    Returns False (nothing written) when another edit got there first - no row is locked
+    while a form is open, and a conflicting save fails instead of waiting."""
+    values = dict(values)
+    values[model.version] = model.version + 1
+    return model.query.filter(model.id == record_id, model.version == expected_version).update(values) == 1
+
+def bulk_update_jobs(job_ids, column, value):
+    """Set one column on many jobs with a single UPDATE; returns how many jobs changed"""
+    targets = Job.query.filter(Job.id.in_(job_ids), column != value).with_entities(Job.id, Job.date_time).all()
+    if not targets:
+        return 0
+    ids = [job_id for job_id, _ in targets]
+    
+    if column is Job.status:
+        customers.jobs_status_changed(ids, value)
+    affected = Job.query.filter(Job.id.in_(ids)).update(
+        {column: value, Job.version: Job.version + 1}, synchronize_session=False
+    )
+    changes.record('job', ids)
+    db.session.commit()
+    
+    for day in {date_time.date() for _, date_time in targets}:
+        invalidate_exports('jobs', day)
+    return affected
+
+def bulk_delete_jobs(job_ids):
+    """Delete many jobs and their items with two DELETE statements; returns (jobs, items) deleted"""
+    targets = Job.query.filter(Job.id.in_(job_ids)).with_entities(Job.id, Job.date_time).all()
+    if not targets:
+        return 0, 0
+    ids = [job_id for job_id, _ in targets]
+    item_ids = [item_id for item_id, in db.session.query(JobItem.id).filter(JobItem.job_id.in_(ids))]
+    
+    customers.jobs_removed(ids)
+    search.remove_jobs(ids)
+    changes.record('job_item', item_ids, action='delete')
+    changes.record('job', ids, action='delete')
+    # job_items has no ON DELETE CASCADE, so the items go first in their own statement
+    items_deleted = JobItem.query.filter(JobItem.job_id.in_(ids)).delete(synchronize_session=False)
+    affected = Job.query.filter(Job.id.in_(ids)).delete(synchronize_session=False)
+    db.session.commit()
+    
+    for day in {date_time.date() for _, date_time in targets}:
+        invalidate_exports('jobs', day)
+    return affected, items_deleted
+
+def warm_exports():
+    """Precompute yesterday's standard exports, the usual first downloads of the day"""
+    today = datetime.now().date()
+    for kind in EXPORT_MODELS:
+        rows = None
+        for format_type in EXPORT_FORMATS:
+            if compression.has_artifact(export_artifact_name(kind, 'yesterday', format_type, today)):
+                continue
+            if rows is None:
+                version = data_version()
+                rows = export_rows(kind, 'yesterday', today)
+            buffer = build_export(kind, format_type, rows, 'yesterday')
+            store_export(buffer, kind, 'yesterday', format_type, today, version)
+
+def invalidate_exports(kind, affected_date):
+    """Drop stored exports whose period covers affected_date, plus any from previous days"""
+    today = datetime.now().date()
+    for name in compression.artifact_names():
+        try:
+            artifact_kind, filter_type, format_type, day = name.rsplit('_', 3)
+        except ValueError:
+            continue
+        if day != today.strftime('%Y%m%d'):
+            compression.remove_artifact(name)
+            continue
+        if artifact_kind == kind and period_covers(filter_type, today, affected_date):
+            compression.remove_artifact(name)
+
+def dashboard_stats(today):
+    """Dashboard figures and the six-month chart, as plain JSON-friendly values"""
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    
+    # Jobs statistics
+    jobs_today = Job.query.filter(
+        db.func.date(Job.date_time) == today
+    ).count()
+    
+    jobs_today_completed = Job.query.filter(
+        db.func.date(Job.date_time) == today,
+        Job.status == 'Completed'
+    ).count()
+    
+    jobs_week = Job.query.filter(
+        db.func.date(Job.date_time) >= week_start,
+        Job.status == 'Completed'
+    ).count()
+    
+    jobs_month = Job.query.filter(
+        db.func.date(Job.date_time) >= month_start,
+        Job.status == 'Completed'
+    ).count()
+    
+    incomplete_jobs = Job.query.filter(Job.status == 'Incomplete').count()
+    
+    # Expenditure statistics
+    expenditures_today = db.session.query(db.func.sum(Expenditure.total)).filter(
+        db.func.date(Expenditure.date_time) == today
+    ).scalar() or 0
+    
+    expenditures_month = db.session.query(db.func.sum(Expenditure.total)).filter(
+        db.func.date(Expenditure.date_time) >= month_start
+    ).scalar() or 0
+    
+    # Revenue statistics
+    revenue_month = db.session.query(db.func.sum(JobItem.total)).join(Job).filter(
+        db.func.date(Job.date_time) >= month_start,
+        Job.status == 'Completed'
+    ).scalar() or 0
+    
+    net_balance = revenue_month - expenditures_month
+    
+    return {
+        'jobs_today': jobs_today,
+        'jobs_today_completed': jobs_today_completed,
+        'jobs_week': jobs_week,
+        'jobs_month': jobs_month,
+        'incomplete_jobs': incomplete_jobs,
+        'expenditures_today': float(expenditures_today),
+        'expenditures_month': float(expenditures_month),
+        'revenue_month': float(revenue_month),
+        'net_balance': float(net_balance),
+        'chart_data': generate_monthly_chart(),
+    }
+
+def data_version():
+    """Latest change feed sequence number - changes whenever any record is written"""
+    return db.session.query(db.func.max(ChangeLog.seq)).scalar() or 0
+
+def dashboard_cache_key(today):
+    return f'{today.isoformat()}:{data_version()}'
+
+def cached_dashboard_stats(today):
+    key = dashboard_cache_key(today)
+    stats = scheduler.load('dashboard', key)
+    scheduler.count('dashboard', hit=stats is not None)
+    if stats is None:
+        stats = dashboard_stats(today)
+        scheduler.store('dashboard', key, stats)
+    return stats
+
+def warm_dashboard():
+    today = datetime.now().date()
+    key = dashboard_cache_key(today)
+    if scheduler.load('dashboard', key) is None:
+        scheduler.store('dashboard', key, dashboard_stats(today))
 
-# Helper Functions
 def generate_monthly_chart():
     # Generate data for the last 6 months
     months = []
     revenues = []
     expenditures = []
     
+    # Months older than the newest archived row also need the archive tables
+    jobs_horizon = archive_horizon(ArchivedJob)
+    expenditures_horizon = archive_horizon(ArchivedExpenditure)
+    
     for i in range(5, -1, -1):
         month_date = datetime.now().replace(day=1) - timedelta(days=30*i)
         next_month = (month_date.replace(day=28) + timedelta(days=4)).replace(day=1)
@@ -554,31 +1015,47 @@ def generate_monthly_chart():
             Expenditure.date_time < next_month
         ).scalar() or 0
         
+        if jobs_horizon is not None and jobs_horizon >= month_date:
+            revenue += db.session.query(db.func.sum(ArchivedJobItem.total)).join(ArchivedJob).filter(
+                ArchivedJob.date_time >= month_date,
+                ArchivedJob.date_time < next_month,
+                ArchivedJob.status == 'Completed'
+            ).scalar() or 0
+        
+        if expenditures_horizon is not None and expenditures_horizon >= month_date:
+            expenditure += db.session.query(db.func.sum(ArchivedExpenditure.total)).filter(
+                ArchivedExpenditure.date_time >= month_date,
+                ArchivedExpenditure.date_time < next_month
+            ).scalar() or 0
+        
         months.append(month_date.strftime('%b %Y'))
         revenues.append(float(revenue))
         expenditures.append(float(expenditure))
     
-    # Create chart
-    plt.figure(figsize=(10, 6))
+    # Create chart. A Figure of its own rather than pyplot's global current figure,
+    # since the scheduler thread draws it while requests may be drawing it too.
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
     x = range(len(months))
     width = 0.35
     
-    plt.bar([i - width/2 for i in x], revenues, width, label='Revenue', color='#28a745')
-    plt.bar([i + width/2 for i in x], expenditures, width, label='Expenditures', color='#dc3545')
+    ax.bar([i - width/2 for i in x], revenues, width, label='Revenue', color='#28a745')
+    ax.bar([i + width/2 for i in x], expenditures, width, label='Expenditures', color='#dc3545')
     
-    plt.xlabel('Month')
-    plt.ylabel('Amount')
-    plt.title('Monthly Revenue vs Expenditures')
-    plt.xticks(x, months, rotation=45)
-    plt.legend()
-    plt.tight_layout()
+    ax.set_xlabel('Month')
+    ax.set_ylabel('Amount')
+    ax.set_title('Monthly Revenue vs Expenditures')
+    ax.set_xticks(list(x))
+    ax.set_xticklabels(months, rotation=45)
+    ax.legend()
+    fig.tight_layout()
     
     # Convert to base64
     img = BytesIO()
-    plt.savefig(img, format='png')
+    fig.savefig(img, format='png')
     img.seek(0)
     chart_url = base64.b64encode(img.getvalue()).decode()
-    plt.close()
     
     return chart_url
 
@@ -605,13 +1082,7 @@ def export_jobs_excel(jobs, filter_type):
         df.to_excel(writer, sheet_name='Jobs', index=False)
     
     output.seek(0)
-    
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=f'jobs_{filter_type}_{datetime.now().strftime("%Y%m%d")}.xlsx'
-    )
+    return output
 
 def export_expenditures_excel(expenditures, filter_type):
     data = []
@@ -633,13 +1104,7 @@ def export_expenditures_excel(expenditures, filter_type):
         df.to_excel(writer, sheet_name='Expenditures', index=False)
     
     output.seek(0)
-    
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=f'expenditures_{filter_type}_{datetime.now().strftime("%Y%m%d")}.xlsx'
-    )
+    return output
 
 def export_jobs_pdf(jobs, filter_type):
     buffer = BytesIO()
@@ -682,13 +1147,7 @@ def export_jobs_pdf(jobs, filter_type):
     
     p.save()
     buffer.seek(0)
-    
-    return send_file(
-        buffer,
-        mimetype='application/pdf',
-        as_attachment=True,
-        download_name=f'jobs_{filter_type}_{datetime.now().strftime("%Y%m%d")}.pdf'
-    )
+    return buffer
 
 def export_expenditures_pdf(expenditures, filter_type):
     buffer = BytesIO()
@@ -726,10 +1185,8 @@ def export_expenditures_pdf(expenditures, filter_type):
     
     p.save()
     buffer.seek(0)
-    
-    return send_file(
-        buffer,
-        mimetype='application/pdf',
-        as_attachment=True,
-        download_name=f'expenditures_{filter_type}_{datetime.now().strftime("%Y%m%d")}.pdf'
-    )
\ No newline at end of file
+    return buffer
+
+# Scheduled precomputation (see scheduler.py)
+scheduler.register('dashboard', warm_dashboard, scheduler.job_interval('WARM_DASHBOARD_MINUTES', 5))
+scheduler.register('exports', warm_exports, scheduler.job_interval('WARM_EXPORTS_MINUTES', 60))
@@ -0,0 +1,150 @@
+"""
+In-process scheduler for precomputation and cache warming.
+
+Jobs are registered with register() and run by a background thread in every worker, but
+only the worker holding instance/scheduler.lock executes them, so gunicorn workers never
+duplicate the work. The thread starts with a worker's first request (scripts that import
+the app never start it), runs every job once straight away, then on each job's interval.
+
+Precomputed values live in instance/precomputed/ so every worker can read them.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import Counter
+from datetime import datetime
+from flask import current_app
+from compression import write_atomic
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_FILE = 'scheduler.lock'
+PRECOMPUTED_DIR = 'precomputed'
+TICK_SECONDS = 30
+
+_jobs = {}
+_stats = Counter()
+_job_status = {}
+_started = False
+_start_lock = threading.Lock()
+
+def init_scheduler(app):
+    app.config.setdefault('SCHEDULER_ENABLED', os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true')
+
+    @app.before_request
+    def _start_on_first_request():
+        if not _started:
+            start_scheduler(app)
+
+def register(name, func, minutes):
+    """Run func every `minutes` (and once at startup) in the lock-holding worker"""
+    _jobs[name] = {'func': func, 'interval': minutes * 60, 'next_run': 0}
+
+def job_interval(env_name, default):
+    return int(os.environ.get(env_name, default))
+
+def start_scheduler(app):
+    global _started
+    with _start_lock:
+        if _started or not app.config['SCHEDULER_ENABLED']:
+            return
+        _started = True
+    thread = threading.Thread(target=_run, args=(app,), name='scheduler', daemon=True)
+    thread.start()
+
+class _FileLock:
+    """Non-blocking exclusive lock on a file, released when the process exits"""
+
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+
+    def acquire(self):
+        if self.handle is not None:
+            return True
+        handle = open(self.path, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            handle.close()
+            return False
+        self.handle = handle
+        return True
+
+def _run(app):
+    os.makedirs(app.instance_path, exist_ok=True)
+    lock = _FileLock(os.path.join(app.instance_path, LOCK_FILE))
+    while True:
+        # Retried every tick, so another worker takes over if the leader exits
+        if lock.acquire():
+            _run_due_jobs(app)
+        time.sleep(TICK_SECONDS)
+
+def _run_due_jobs(app):
+    for name, job in _jobs.items():
+        if time.time() < job['next_run']:
+            continue
+        started = time.time()
+        with app.app_context():
+            try:
+                job['func']()
+                _job_status[name] = {'last_run': datetime.now().isoformat(), 'ok': True}
+            except Exception as e:
+                app.logger.exception('Scheduled job %s failed', name)
+                _job_status[name] = {'last_run': datetime.now().isoformat(), 'ok': False, 'error': str(e)}
+            finally:
+                app.extensions['sqlalchemy'].session.remove()
+        _job_status[name]['seconds'] = round(time.time() - started, 3)
+        job['next_run'] = started + job['interval']
+
+# Precomputed values shared between workers
+def _precomputed_path(name):
+    path = os.path.join(current_app.instance_path, PRECOMPUTED_DIR)
+    os.makedirs(path, exist_ok=True)
+    return os.path.join(path, f'{name}.json')
+
+def load(name, key):
+    """Stored value for `name` if it was computed for `key`, else None"""
+    try:
+        with open(_precomputed_path(name)) as stored:
+            entry = json.load(stored)
+    except (FileNotFoundError, ValueError):
+        entry = None
+    return entry['value'] if entry and entry['key'] == key else None
+
+def store(name, key, value):
+    write_atomic(_precomputed_path(name), json.dumps({'key': key, 'value': value}).encode())
+
+def clear():
+    """Drop all precomputed values, e.g. after archival moved rows behind their back"""
+    path = os.path.join(current_app.instance_path, PRECOMPUTED_DIR)
+    if os.path.isdir(path):
+        for filename in os.listdir(path):
+            try:
+                os.remove(os.path.join(path, filename))
+            except FileNotFoundError:
+                pass
+
+def count(cache, hit):
+    _stats[f'{cache}_hits' if hit else f'{cache}_misses'] += 1
+
+def stats():
+    """This worker's cache hit/miss counts and, if it is the leader, job status"""
+    return {
+        'pid': os.getpid(),
+        'cache': dict(_stats),
+        'jobs': {
+            name: dict(_job_status.get(name, {}), interval_minutes=job['interval'] // 60)
+            for name, job in _jobs.items()
+        },
+    }
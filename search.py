@@ -0,0 +1,241 @@
+"""
+Full-text search over job customer names, job item descriptions and expenditure descriptions.
+
+SQLite keeps an FTS5 table (search_index) that the write routes update in the same
+transaction. MySQL and PostgreSQL search the live tables through their native
+full-text indexes, which the database maintains itself.
+"""
+
+import re
+from app import db, Job, Expenditure
+
+SEARCH_TABLE = 'search_index'
+MAX_TERMS = 8
+
+# FTS5 rowids encode the source row: even = job, odd = expenditure
+def _job_rowid(job_id):
+    return job_id * 2
+
+def _expenditure_rowid(expenditure_id):
+    return expenditure_id * 2 + 1
+
+_sqlite_index_ready = False
+
+def _dialect():
+    return db.engine.dialect.name
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+def _sqlite_index_exists():
+    return db.session.execute(db.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+    ), {'name': SEARCH_TABLE}).first() is not None
+
+def _ensure_sqlite_index(build=True):
+    """True once the FTS5 table exists, building it first if allowed and needed.
+    Migration 5 builds it on deploy, so this is only a fallback for databases that skipped it."""
+    global _sqlite_index_ready
+    if _sqlite_index_ready:
+        return True
+    if not _sqlite_index_exists():
+        if not build:
+            return False
+        _build_sqlite_index()
+    _sqlite_index_ready = True
+    return True
+
+def _build_sqlite_index(replace=False):
+    """Create and fill the FTS5 table in one transaction on a connection of its own, so the
+    fill is committed together with the table no matter what the current request does"""
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        # Taken up front: the sqlite3 module would otherwise run the CREATE outside any transaction
+        cursor.execute('BEGIN IMMEDIATE')
+        if replace:
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_TABLE,)
+        ).fetchone()
+        # Another worker may have built it in the meantime
+        if not exists:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {SEARCH_TABLE} "
+                "USING fts5(title, body, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) "
+                "SELECT jobs.id * 2, jobs.customer_name, COALESCE(GROUP_CONCAT(job_items.description, ' '), '') "
+                "FROM jobs LEFT JOIN job_items ON job_items.job_id = jobs.id GROUP BY jobs.id"
+            )
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) "
+                "SELECT id * 2 + 1, '', description FROM expenditures"
+            )
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+def _replace_row(rowid, title, body):
+    db.session.execute(db.text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :rowid"), {'rowid': rowid})
+    db.session.execute(db.text(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES (:rowid, :title, :body)"
+    ), {'rowid': rowid, 'title': title, 'body': body})
+
+def _delete_rows(rowids):
+    if rowids:
+        db.session.execute(
+            db.text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN :rowids").bindparams(
+                db.bindparam('rowids', expanding=True)),
+            {'rowids': list(rowids)}
+        )
+
+# Sync hooks - called by the write routes before they commit. They never build the index:
+# the route may already hold SQLite's write lock, and a later build picks up its rows anyway.
+def index_job(job_id, customer_name, descriptions):
+    if _dialect() != 'sqlite':
+        return
+    if not _ensure_sqlite_index(build=False):
+        return
+    _replace_row(_job_rowid(job_id), customer_name, ' '.join(descriptions))
+
+def remove_jobs(job_ids):
+    if _dialect() != 'sqlite':
+        return
+    if not _ensure_sqlite_index(build=False):
+        return
+    _delete_rows([_job_rowid(job_id) for job_id in job_ids])
+
+def index_expenditure(expenditure_id, description):
+    if _dialect() != 'sqlite':
+        return
+    if not _ensure_sqlite_index(build=False):
+        return
+    _replace_row(_expenditure_rowid(expenditure_id), '', description)
+
+def remove_expenditures(expenditure_ids):
+    if _dialect() != 'sqlite':
+        return
+    if not _ensure_sqlite_index(build=False):
+        return
+    _delete_rows([_expenditure_rowid(expenditure_id) for expenditure_id in expenditure_ids])
+
+# Ranked queries per backend: (count_sql, page_sql, params), page rows are (kind, ref_id, score)
+def _sqlite_queries(terms):
+    _ensure_sqlite_index()
+    match = ' '.join(f'"{term}"*' for term in terms)
+    # One FTS row per job/expenditure, so no grouping is needed. bm25() is
+    # lower-is-better and customer names weigh more than item descriptions.
+    count_sql = f"SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :q"
+    page_sql = (
+        "SELECT CASE rowid % 2 WHEN 0 THEN 'job' ELSE 'expenditure' END AS kind, "
+        f"rowid / 2 AS ref_id, -bm25({SEARCH_TABLE}, 5.0, 1.0) AS score "
+        f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :q "
+        f"ORDER BY bm25({SEARCH_TABLE}, 5.0, 1.0), rowid DESC LIMIT :limit OFFSET :offset"
+    )
+    return count_sql, page_sql, {'q': match}
+
+def _grouped_queries(hits_sql):
+    # A job can match on its customer name and several items, fold those into one hit
+    count_sql = f"SELECT COUNT(*) FROM (SELECT kind, ref_id FROM ({hits_sql}) hits GROUP BY kind, ref_id) matches"
+    page_sql = (
+        f"SELECT kind, ref_id, SUM(score) AS score FROM ({hits_sql}) hits "
+        "GROUP BY kind, ref_id ORDER BY score DESC, ref_id DESC LIMIT :limit OFFSET :offset"
+    )
+    return count_sql, page_sql
+
+def _mysql_queries(terms):
+    match = ' '.join(f'+{term}*' for term in terms)
+    hits_sql = (
+        "SELECT 'job' AS kind, id AS ref_id, 5 * MATCH(customer_name) AGAINST (:q IN BOOLEAN MODE) AS score "
+        "FROM jobs WHERE MATCH(customer_name) AGAINST (:q IN BOOLEAN MODE) "
+        "UNION ALL "
+        "SELECT 'job', job_id, MATCH(description) AGAINST (:q IN BOOLEAN MODE) "
+        "FROM job_items WHERE MATCH(description) AGAINST (:q IN BOOLEAN MODE) "
+        "UNION ALL "
+        "SELECT 'expenditure', id, MATCH(description) AGAINST (:q IN BOOLEAN MODE) "
+        "FROM expenditures WHERE MATCH(description) AGAINST (:q IN BOOLEAN MODE)"
+    )
+    return _grouped_queries(hits_sql) + ({'q': match},)
+
+def _postgresql_queries(terms):
+    match = ' & '.join(f'{term}:*' for term in terms)
+    hits_sql = (
+        "SELECT 'job' AS kind, id AS ref_id, 5 * ts_rank(to_tsvector('simple', customer_name), to_tsquery('simple', :q)) AS score "
+        "FROM jobs WHERE to_tsvector('simple', customer_name) @@ to_tsquery('simple', :q) "
+        "UNION ALL "
+        "SELECT 'job', job_id, ts_rank(to_tsvector('simple', description), to_tsquery('simple', :q)) "
+        "FROM job_items WHERE to_tsvector('simple', description) @@ to_tsquery('simple', :q) "
+        "UNION ALL "
+        "SELECT 'expenditure', id, ts_rank(to_tsvector('simple', description), to_tsquery('simple', :q)) "
+        "FROM expenditures WHERE to_tsvector('simple', description) @@ to_tsquery('simple', :q)"
+    )
+    return _grouped_queries(hits_sql) + ({'q': match},)
+
+_QUERIES = {
+    'sqlite': _sqlite_queries,
+    'mysql': _mysql_queries,
+    'postgresql': _postgresql_queries,
+}
+
+def search(query, page=1, per_page=20):
+    """Return (results, total) for one page of ranked matches"""
+    terms = _terms(query)
+    build_queries = _QUERIES.get(_dialect())
+    if not terms or build_queries is None:
+        return [], 0
+
+    count_sql, page_sql, params = build_queries(terms)
+    total = db.session.execute(db.text(count_sql), params).scalar()
+    rows = db.session.execute(
+        db.text(page_sql), dict(params, limit=per_page, offset=(page - 1) * per_page)
+    ).all()
+
+    job_ids = [row.ref_id for row in rows if row.kind == 'job']
+    expenditure_ids = [row.ref_id for row in rows if row.kind == 'expenditure']
+    jobs = {job.id: job for job in Job.query.filter(Job.id.in_(job_ids)).all()} if job_ids else {}
+    expenditures = {exp.id: exp for exp in Expenditure.query.filter(
+        Expenditure.id.in_(expenditure_ids)).all()} if expenditure_ids else {}
+
+    results = []
+    for row in rows:
+        record = jobs.get(row.ref_id) if row.kind == 'job' else expenditures.get(row.ref_id)
+        if record is not None:
+            results.append({'kind': row.kind, 'record': record, 'score': float(row.score)})
+    return results, total
+
+def rebuild_search_index():
+    """Recreate the SQLite FTS table, or the native full-text indexes on MySQL/PostgreSQL"""
+    global _sqlite_index_ready
+    dialect = _dialect()
+
+    if dialect == 'sqlite':
+        db.session.commit()  # The rebuild needs the write lock on its own connection
+        _build_sqlite_index(replace=True)
+        _sqlite_index_ready = True
+    elif dialect == 'mysql':
+        existing = {row[0] for row in db.session.execute(db.text(
+            "SELECT DISTINCT index_name FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND index_type = 'FULLTEXT'"
+        ))}
+        for name, table, column in (('ft_jobs_customer_name', 'jobs', 'customer_name'),
+                                    ('ft_job_items_description', 'job_items', 'description'),
+                                    ('ft_expenditures_description', 'expenditures', 'description')):
+            if name not in existing:
+                db.session.execute(db.text(f"ALTER TABLE {table} ADD FULLTEXT INDEX {name} ({column})"))
+    elif dialect == 'postgresql':
+        for name, table, column in (('ft_jobs_customer_name', 'jobs', 'customer_name'),
+                                    ('ft_job_items_description', 'job_items', 'description'),
+                                    ('ft_expenditures_description', 'expenditures', 'description')):
+            db.session.execute(db.text(f"DROP INDEX IF EXISTS {name}"))
+            db.session.execute(db.text(
+                f"CREATE INDEX {name} ON {table} USING gin (to_tsvector('simple', {column}))"
+            ))
+    else:
+        raise RuntimeError(f"Full-text search is not supported on {dialect}")
+
+    db.session.commit()
@@ -6,6 +6,7 @@ This script helps set up the database for production use with MySQL
 
 import os
 from app import app, db, User
+from migrations import run_migrations
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -17,6 +18,9 @@ def create_database():
         print("Creating database tables...")
         db.create_all()  # SQLAlchemy creates tables based on models
         print("✅ Database tables created successfully!")
+        
+        # Records the schema version; on an existing database also upgrades it
+        run_migrations()
 
 def create_default_users():
     """Create default admin and user accounts"""
@@ -0,0 +1,49 @@
+"""
+Shared test setup: a scratch SQLite database and instance folder, configured before the
+app is imported (app.py reads DATABASE_URL and INSTANCE_PATH at import time).
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import pytest
+
+_scratch = tempfile.mkdtemp(prefix='zehmo-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_scratch, 'test.db')
+os.environ['INSTANCE_PATH'] = _scratch
+os.environ['SCHEDULER_ENABLED'] = 'false'
+os.environ['LOGIN_THROTTLE_ENABLED'] = 'false'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app, db, User
+import search
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_scratch, ignore_errors=True)
+
+@pytest.fixture
+def app():
+    """Empty database with one admin (admin / admin123)"""
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        search.rebuild_search_index()
+        admin = User(username='admin', role='admin')
+        admin.set_password('admin123')
+        db.session.add(admin)
+        db.session.commit()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+
+@pytest.fixture
+def login(app):
+    """login() -> a test client with its own session, logged in as the admin"""
+    def login(username='admin', password='admin123'):
+        client = app.test_client()
+        response = client.post('/login', data={'username': username, 'password': password})
+        assert response.status_code == 302
+        return client
+    return login
@@ -0,0 +1,48 @@
+"""
+Archival: an archived id must never be handed out again, or the next archive run
+collides with the archived copy.
+"""
+
+from datetime import datetime, timedelta
+from app import db, Job, JobItem, ArchivedJob, ArchivedJobItem
+import archive_database
+import migrations
+
+FUTURE = datetime.now() + timedelta(days=1)
+
+def add_job(client, customer_name):
+    client.post('/add_job', data={
+        'customer_name': customer_name, 'status': 'Completed', 'payment_method': 'Cash',
+        'description[]': ['Oil change'], 'quantity[]': ['1'], 'price[]': ['8000'],
+    })
+    return Job.query.filter_by(customer_name=customer_name).one().id
+
+def test_archived_newest_id_is_not_reused(app, login):
+    client = login()
+    with app.app_context():
+        archived_id = add_job(client, 'Ade')
+        assert archive_database.archive_jobs(FUTURE, 500) == 1
+
+        new_id = add_job(client, 'Bola')
+        assert new_id > archived_id
+        assert archive_database.archive_jobs(FUTURE, 500) == 1
+        assert sorted(job.id for job in ArchivedJob.query) == [archived_id, new_id]
+
+def test_migration_moves_live_rows_off_archived_ids(app, login):
+    client = login()
+    with app.app_context():
+        archived_id = add_job(client, 'Ade')
+        archive_database.archive_jobs(FUTURE, 500)
+        # What SQLite did before ids were AUTOINCREMENT: the archived id came back
+        db.session.add(Job(id=archived_id, customer_name='Bola', created_by=1))
+        db.session.add(JobItem(job_id=archived_id, description='Tyre', quantity=1, price=5, total=5))
+        db.session.commit()
+
+        migrations.non_reusable_ids(None)
+
+        job = Job.query.filter_by(customer_name='Bola').one()
+        assert job.id > archived_id
+        assert [item.job_id for item in job.items] == [job.id]
+        item_ids = {item.id for item in ArchivedJobItem.query}
+        assert not item_ids & {item.id for item in JobItem.query}
+        assert archive_database.archive_jobs(FUTURE, 500) == 1
@@ -0,0 +1,130 @@
+"""
+Optimistic concurrency on job and expenditure edits: saves from the same version must not
+overwrite each other, and a losing save must fail straight away instead of waiting.
+"""
+
+import time
+import threading
+from app import db, Job, JobItem, Expenditure, Customer
+from routes import EDIT_STALE_FORM_MESSAGE
+import customers
+
+SAVED = b'updated successfully'
+CONFLICT = b'was changed by someone else'
+STALE_FORM = EDIT_STALE_FORM_MESSAGE.split('.')[0].encode()
+# SQLite's busy timeout is 5s; a save that queued behind another one's lock would get near it
+FAIL_FAST_SECONDS = 2
+
+def add_job(client, customer_name='Ade'):
+    client.post('/add_job', data={
+        'customer_name': customer_name, 'status': 'Completed', 'payment_method': 'Cash',
+        'description[]': ['Oil change'], 'quantity[]': ['1'], 'price[]': ['8000'],
+    })
+    return db.session.query(db.func.max(Job.id)).scalar()
+
+def job_form(customer_name, version, price):
+    return {
+        'customer_name': customer_name, 'status': 'Completed', 'payment_method': 'Transfer',
+        'description[]': [f'Service for {customer_name}'], 'quantity[]': ['2'], 'price[]': [str(price)],
+        'version': version,
+    }
+
+def customer_totals():
+    return sorted((c.name_key, c.job_count, round(c.lifetime_revenue, 2))
+                  for c in Customer.query.filter(Customer.job_count > 0))
+
+def assert_customers_consistent():
+    # The running totals must equal a recount from the jobs table
+    kept = customer_totals()
+    customers.rebuild_customers()
+    assert kept == customer_totals()
+
+def test_two_saves_from_the_same_version(app, login):
+    first, second = login(), login()
+    with app.app_context():
+        job_id = add_job(first)
+    version = first.get(f'/get_job/{job_id}').get_json()['version']
+    assert second.get(f'/get_job/{job_id}').get_json()['version'] == version
+
+    won = first.post(f'/edit_job/{job_id}', data=job_form('Bola', version, 100), follow_redirects=True)
+    lost = second.post(f'/edit_job/{job_id}', data=job_form('Chidi', version, 999), follow_redirects=True)
+    assert SAVED in won.data
+    assert CONFLICT in lost.data and SAVED not in lost.data
+
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        assert (job.customer_name, job.customer_key, job.payment_method, job.version) == \
+            ('Bola', 'bola', 'Transfer', version + 1)
+        items = JobItem.query.filter_by(job_id=job_id).all()
+        assert [(item.description, item.total) for item in items] == [('Service for Bola', 200)]
+        assert customer_totals() == [('bola', 1, 200.0)]
+        assert_customers_consistent()
+
+def test_expenditure_saves_from_the_same_version(app, login):
+    first, second = login(), login()
+    first.post('/add_expenditure', data={'description': 'Fuel', 'quantity': '1', 'amount_used': '50'})
+    with app.app_context():
+        expenditure_id = db.session.query(db.func.max(Expenditure.id)).scalar()
+    version = first.get(f'/get_expenditure/{expenditure_id}').get_json()['version']
+
+    form = lambda description, amount: {'description': description, 'quantity': '2',
+                                        'amount_used': str(amount), 'version': version}
+    won = first.post(f'/edit_expenditure/{expenditure_id}', data=form('Diesel', 60), follow_redirects=True)
+    lost = second.post(f'/edit_expenditure/{expenditure_id}', data=form('Petrol', 70), follow_redirects=True)
+    assert SAVED in won.data
+    assert CONFLICT in lost.data
+
+    with app.app_context():
+        expenditure = db.session.get(Expenditure, expenditure_id)
+        assert (expenditure.description, expenditure.total, expenditure.version) == ('Diesel', 120, version + 1)
+
+def test_save_without_a_version_asks_for_a_reload(app, login):
+    client = login()
+    with app.app_context():
+        job_id = add_job(client)
+    form = job_form('Dayo', None, 100)
+    del form['version']
+
+    response = client.post(f'/edit_job/{job_id}', data=form, follow_redirects=True)
+    assert STALE_FORM in response.data
+    assert CONFLICT not in response.data
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        assert (job.customer_name, job.version) == ('Ade', 1)
+
+def test_racing_saves_lose_no_updates_and_fail_fast(app, login):
+    racers = 8
+    clients = [login() for _ in range(racers)]
+    with app.app_context():
+        job_id = add_job(clients[0])
+    version = clients[0].get(f'/get_job/{job_id}').get_json()['version']
+
+    start = threading.Barrier(racers)
+    results = [None] * racers
+
+    def save(number):
+        start.wait()
+        started = time.perf_counter()
+        response = clients[number].post(f'/edit_job/{job_id}', data=job_form(f'Racer{number}', version, 10 + number),
+                                        follow_redirects=True)
+        results[number] = (SAVED in response.data, CONFLICT in response.data, time.perf_counter() - started)
+
+    threads = [threading.Thread(target=save, args=(number,)) for number in range(racers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    winners = [number for number, (saved, _, _) in enumerate(results) if saved]
+    assert len(winners) == 1
+    assert sum(1 for _, conflict, _ in results if conflict) == racers - 1
+    assert max(seconds for _, _, seconds in results) < FAIL_FAST_SECONDS
+
+    winner = winners[0]
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        assert (job.customer_name, job.version) == (f'Racer{winner}', version + 1)
+        items = JobItem.query.filter_by(job_id=job_id).all()
+        assert [item.total for item in items] == [2 * (10 + winner)]
+        assert customer_totals() == [(f'racer{winner}', 1, 2.0 * (10 + winner))]
+        assert_customers_consistent()
@@ -0,0 +1,70 @@
+"""
+Customer aggregates: autocomplete and the batched rebuild.
+"""
+
+import threading
+from app import db, Job, Customer
+import customers
+
+def add_job(client, customer_name, price=100):
+    response = client.post('/add_job', data={
+        'customer_name': customer_name, 'status': 'Completed', 'payment_method': 'Cash',
+        'description[]': ['Oil change'], 'quantity[]': ['1'], 'price[]': [str(price)],
+    }, follow_redirects=True)
+    assert b'Job added successfully' in response.data
+
+def totals():
+    return {c.name_key: (c.job_count, round(c.lifetime_revenue, 2)) for c in Customer.query if c.job_count}
+
+def test_autocomplete_skips_customers_without_jobs(app, login):
+    client = login()
+    add_job(client, 'Ade')
+    add_job(client, 'Adebayo')
+    with app.app_context():
+        db.session.add(Customer(name='Adewale', name_key='adewale', job_count=0, lifetime_revenue=0))
+        db.session.commit()
+    names = [match['name'] for match in client.get('/customers/autocomplete?q=ade').get_json()]
+    assert names == ['Ade', 'Adebayo']
+
+def test_autocomplete_treats_wildcards_literally(app, login):
+    client = login()
+    add_job(client, 'Ade')
+    add_job(client, '50% Motors')
+    assert client.get('/customers/autocomplete?q=%25').get_json() == []
+    assert client.get('/customers/autocomplete?q=_').get_json() == []
+    assert [match['name'] for match in client.get('/customers/autocomplete?q=50%25').get_json()] == ['50% Motors']
+
+def test_rebuild_creates_missing_customers(app, login):
+    client = login()
+    add_job(client, 'Ade', price=100)
+    add_job(client, ' ade ', price=50)
+    with app.app_context():
+        expected = totals()
+        Customer.query.delete()
+        db.session.commit()
+        customers.rebuild_customers(batch_size=1)
+        assert totals() == expected == {'ade': (2, 150.0)}
+
+def test_rebuild_keeps_jobs_added_while_it_runs(app, login):
+    client = login()
+    for number in range(30):
+        add_job(client, f'Customer {number}')
+    writer = login()
+    names = [f'Customer {number % 30}' for number in range(40)]
+
+    def keep_adding():
+        for name in names:
+            add_job(writer, name)
+
+    thread = threading.Thread(target=keep_adding)
+    thread.start()
+    with app.app_context():
+        for _ in range(5):
+            customers.rebuild_customers(batch_size=4)
+    thread.join()
+
+    with app.app_context():
+        assert sum(job_count for job_count, _ in totals().values()) == Job.query.count() == 70
+        kept = totals()
+        customers.rebuild_customers()
+        assert totals() == kept
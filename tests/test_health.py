@@ -0,0 +1,22 @@
+"""
+Health checks: /readyz is unauthenticated, so a database failure must not leak driver details.
+"""
+
+import warmup
+from app import db
+
+def test_readyz_hides_database_errors(app, monkeypatch, caplog):
+    monkeypatch.setattr(warmup, 'is_ready', lambda: True)
+    def fail(*args, **kwargs):
+        raise RuntimeError('could not connect to server at db.internal:5432 as user zehmo')
+    monkeypatch.setattr(db.session, 'execute', fail)
+
+    response = app.test_client().get('/readyz')
+    assert response.status_code == 503
+    assert response.get_json() == {'status': 'database unavailable'}
+    assert 'db.internal' in caplog.text
+
+def test_readyz_when_ready(app, monkeypatch):
+    monkeypatch.setattr(warmup, 'is_ready', lambda: True)
+    response = app.test_client().get('/readyz')
+    assert (response.status_code, response.get_json()) == (200, {'status': 'ready'})
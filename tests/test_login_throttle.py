@@ -0,0 +1,35 @@
+"""
+Login throttling: the per-IP limit must hold no matter what headers the client sends.
+"""
+
+import pytest
+import login_throttle
+
+@pytest.fixture
+def throttled(app):
+    """Throttling on with a fresh in-memory store, restored afterwards"""
+    config = {key: app.config[key] for key in ('LOGIN_THROTTLE_ENABLED', 'LOGIN_MAX_PER_IP', 'TRUSTED_PROXY_COUNT')}
+    store = app.extensions['login_throttle']
+    app.config.update(LOGIN_THROTTLE_ENABLED=True, LOGIN_MAX_PER_IP=30, TRUSTED_PROXY_COUNT=0)
+    app.extensions['login_throttle'] = login_throttle.MemoryStore()
+    yield app
+    app.config.update(config)
+    app.extensions['login_throttle'] = store
+
+def spray(client, attempts, headers=None):
+    """One bad password per username, as a lookup flood would send"""
+    return [
+        client.post('/login', data={'username': f'guess{number}', 'password': 'wrong'},
+                    headers=headers(number) if headers else None).status_code
+        for number in range(attempts)
+    ]
+
+def test_per_ip_limit_applies(throttled):
+    statuses = spray(throttled.test_client(), 40)
+    assert statuses[:30] == [200] * 30
+    assert statuses[30:] == [429] * 10
+
+def test_forwarded_for_header_does_not_lift_the_limit(throttled):
+    # Without TRUSTED_PROXY_COUNT the header is the client's own claim and must be ignored
+    statuses = spray(throttled.test_client(), 40, headers=lambda number: {'X-Forwarded-For': f'10.0.0.{number}'})
+    assert statuses[30:] == [429] * 10
@@ -0,0 +1,73 @@
+"""
+Worker warm-up and readiness.
+
+warm_up(app) does the slow first-time work up front: opening database connections,
+compiling every template and importing the export/chart libraries. gunicorn.conf.py runs
+it in each worker before the worker accepts requests; /readyz only reports ready after it
+has finished.
+"""
+
+import os
+import time
+import threading
+from io import BytesIO
+
+DEFAULT_POOL_CONNECTIONS = 2
+
+_ready = threading.Event()
+_warming = threading.Lock()
+
+def is_ready():
+    return _ready.is_set()
+
+def _prime_pool(db, connections):
+    # Open several connections at once so the pool holds that many idle ones afterwards
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = db.engine.connect()
+            connection.execute(db.text('SELECT 1'))
+            opened.append(connection)
+    finally:
+        for connection in opened:
+            connection.close()
+
+def _compile_templates(app):
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+
+def _import_export_stack():
+    import pandas
+    import openpyxl
+    import seaborn
+    from reportlab.pdfgen import canvas
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    # The first figure loads the font cache and the Agg backend. Not pyplot: this may run
+    # in a background thread (/readyz) while a request draws the dashboard chart.
+    fig = Figure(figsize=(1, 1))
+    FigureCanvasAgg(fig)
+    fig.savefig(BytesIO(), format='png')
+
+def warm_up(app):
+    """Prime the worker; safe to call more than once, only the first call does the work"""
+    with _warming:
+        if _ready.is_set():
+            return
+        started = time.time()
+        db = app.extensions['sqlalchemy']
+        with app.app_context():
+            pool_size = getattr(db.engine.pool, 'size', lambda: 1)()
+            _prime_pool(db, min(pool_size, int(os.environ.get('WARMUP_POOL_CONNECTIONS', DEFAULT_POOL_CONNECTIONS))))
+            _compile_templates(app)
+            _import_export_stack()
+            db.session.execute(db.text('SELECT 1'))
+            db.session.remove()
+        _ready.set()
+        app.logger.info('Worker warmed up in %.2fs', time.time() - started)
+
+def warm_up_in_background(app):
+    """Used by /readyz when no server hook warmed this process (e.g. python app.py)"""
+    if not _ready.is_set() and not _warming.locked():
+        threading.Thread(target=warm_up, args=(app,), name='warmup', daemon=True).start()